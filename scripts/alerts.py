@@ -0,0 +1,119 @@
+import json
+import math
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+
+# Within a rating, urgency halves every PRIORITY_HALF_LIFE_DAYS of age and
+# doubles each time 1 + len(text) / PRIORITY_LENGTH_SCALE doubles
+PRIORITY_HALF_LIFE_DAYS = 7
+PRIORITY_LENGTH_SCALE = 100
+
+
+def _parse_review_timestamp(date_value: Any) -> float:
+    """Parse a review date into a POSIX timestamp (0.0 when unknown)"""
+    if not date_value or not isinstance(date_value, str):
+        return 0.0
+    try:
+        return datetime.fromisoformat(date_value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def review_priority(review: Dict[str, Any]) -> tuple:
+    """Cheap priority key for a raw review - lower sorts first
+
+    Low ratings go first. Within a rating, recency and length are weighed
+    together, so a long, detailed complaint from yesterday still goes before a
+    one-line one from today (long low-rated reviews are the ones most likely to
+    carry a severe complaint). Undated reviews go last within their rating.
+    """
+    rating = review.get('rating')
+    if not isinstance(rating, (int, float)) or rating <= 0:
+        rating = 3  # Unknown rating sits with the neutral reviews
+    text = review.get('text') or ''
+    # log2 of the urgency, up to a constant shared by every review, so the key
+    # does not depend on the current time
+    urgency = (_parse_review_timestamp(review.get('date')) / (PRIORITY_HALF_LIFE_DAYS * 86400)
+               + math.log2(1 + len(text) / PRIORITY_LENGTH_SCALE))
+    return (rating, -urgency)
+
+
+def prioritize_reviews(reviews: List[Dict[str, Any]]) -> List[int]:
+    """Return review indices in the order they should be analyzed"""
+    return sorted(range(len(reviews)), key=lambda i: review_priority(reviews[i]))
+
+
+class AlertSink:
+    """Emit high-severity negative reviews as soon as they are analyzed
+
+    Alerts are appended to a JSONL file (flushed per alert so they can be tailed
+    while the run is in progress) and/or POSTed to a webhook URL.
+    """
+
+    def __init__(self, alerts_path: Optional[str] = None, webhook_url: Optional[str] = None,
+                 min_severity: int = 4):
+        self.alerts_path = alerts_path
+        self.webhook_url = webhook_url
+        self.min_severity = min_severity
+        self.emitted_count = 0
+        self._file = open(alerts_path, 'a', encoding='utf-8') if alerts_path else None
+
+    def should_alert(self, result: Dict[str, Any]) -> bool:
+        """Check whether an analyzed review qualifies as an alert"""
+        analysis = result.get('analysis', {})
+        if analysis.get('sentiment') != 'negative':
+            return False
+        try:
+            return float(analysis.get('severity', 0) or 0) >= self.min_severity
+        except (TypeError, ValueError):
+            return False
+
+    def _build_alert(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        analysis = result.get('analysis', {})
+        return {
+            "review_id": result.get('review_id'),
+            "author": result.get('author', ''),
+            "rating": result.get('rating'),
+            "date": result.get('date', ''),
+            "text": result.get('text', ''),
+            "severity": analysis.get('severity'),
+            "summary": analysis.get('summary', ''),
+            "dimensions": [d.get('name') for d in analysis.get('dimensions', [])],
+            "alerted_at": datetime.now().isoformat()
+        }
+
+    def emit(self, result: Dict[str, Any]) -> bool:
+        """Emit an alert for the result if it qualifies, returns True if emitted"""
+        if not self.should_alert(result):
+            return False
+
+        alert = self._build_alert(result)
+
+        if self._file:
+            self._file.write(json.dumps(alert, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+        if self.webhook_url:
+            import urllib.request
+            
+            try:
+                request = urllib.request.Request(
+                    self.webhook_url,
+                    data=json.dumps(alert, ensure_ascii=False).encode('utf-8'),
+                    headers={"Content-Type": "application/json"},
+                    method="POST"
+                )
+                urllib.request.urlopen(request, timeout=10).close()
+            except Exception as e:
+                # A broken webhook must never stop the analysis run
+                print(f"  Error posting alert for review {alert['review_id']}: {e}")
+
+        self.emitted_count += 1
+        print(f"  ALERT: severity {alert['severity']} negative review {alert['review_id']}")
+        return True
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
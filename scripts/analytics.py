@@ -0,0 +1,262 @@
+from typing import List, Dict, Any, Iterable
+
+import numpy as np
+
+from records import SENTIMENTS, DIMENSIONS
+
+
+SENTIMENT_NAMES = ["positive", "negative", "neutral", "doubtful"]
+_NEGATIVE = SENTIMENTS.id_for("negative")
+_POSITIVE = SENTIMENTS.id_for("positive")
+_DOUBTFUL = SENTIMENTS.id_for("doubtful")
+
+
+def _iso_prefix(date_value: Any) -> str:
+    """First 19 chars of an ISO timestamp, or '' (-> NaT) for anything else"""
+    if isinstance(date_value, str) and len(date_value) >= 19 and date_value[4] == '-' and date_value[10] == 'T':
+        return date_value[:19]
+    return ''
+
+
+def _round_list(values: np.ndarray, digits: int = 3) -> List[Any]:
+    """JSON-friendly list with NaN turned into None"""
+    rounded = np.round(values.astype(np.float64), digits)
+    return [None if np.isnan(v) else float(v) for v in rounded]
+
+
+class ReviewColumns:
+    """Analyzed reviews as parallel NumPy columns
+
+    One row per review: parsed date (datetime64, NaT when unknown), rating,
+    sentiment code (records.SENTIMENTS ids, -1 when missing), score,
+    confidence, severity, author code and local-guide flag (-1 unknown).
+    Dimension mentions are exploded into their own columns keyed by row.
+    """
+
+    def __init__(self, analyzed_reviews: Iterable[Dict[str, Any]]):
+        dates, ratings, sentiments, scores, confidences, severities = [], [], [], [], [], []
+        authors, local_guides = [], []
+        mention_rows, mention_dims, mention_sentiments = [], [], []
+        author_ids: Dict[str, int] = {}
+
+        for row, review in enumerate(analyzed_reviews):
+            analysis = review.get('analysis', {})
+            dates.append(_iso_prefix(review.get('date')))
+            ratings.append(_as_float(review.get('rating')))
+            sentiment = analysis.get('sentiment')
+            sentiments.append(SENTIMENTS.id_for(sentiment) if isinstance(sentiment, str) else -1)
+            scores.append(_as_float(analysis.get('sentiment_score')))
+            confidences.append(_as_float(analysis.get('confidence')))
+            severities.append(_as_float(analysis.get('severity')))
+            authors.append(author_ids.setdefault(review.get('author') or '', len(author_ids)))
+            local_guide = review.get('local_guide')
+            local_guides.append(-1 if local_guide is None else int(bool(local_guide)))
+
+            for dim in analysis.get('dimensions', []):
+                name = dim.get('name')
+                if not isinstance(name, str):
+                    continue
+                dim_sentiment = dim.get('sentiment')
+                mention_rows.append(row)
+                mention_dims.append(DIMENSIONS.id_for(name))
+                mention_sentiments.append(SENTIMENTS.id_for(dim_sentiment) if isinstance(dim_sentiment, str) else -1)
+
+        self.date = np.array(dates, dtype='datetime64[s]')
+        self.rating = np.array(ratings, dtype=np.float32)
+        self.sentiment = np.array(sentiments, dtype=np.int16)
+        self.sentiment_score = np.array(scores, dtype=np.float32)
+        self.confidence = np.array(confidences, dtype=np.float32)
+        self.severity = np.array(severities, dtype=np.float32)
+        self.author = np.array(authors, dtype=np.int32)
+        self.author_names = list(author_ids)
+        self.local_guide = np.array(local_guides, dtype=np.int8)
+        self.mention_row = np.array(mention_rows, dtype=np.int32)
+        self.mention_dimension = np.array(mention_dims, dtype=np.int16)
+        self.mention_sentiment = np.array(mention_sentiments, dtype=np.int16)
+
+    def __len__(self):
+        return len(self.rating)
+
+    def sentiment_counts(self, mask: np.ndarray = None) -> Dict[str, int]:
+        codes = self.sentiment if mask is None else self.sentiment[mask]
+        counts = np.bincount(codes[codes >= 0], minlength=len(SENTIMENTS))
+        return {SENTIMENTS.label(i): int(c) for i, c in enumerate(counts) if c or i < len(SENTIMENT_NAMES)}
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def rolling_sentiment_trend(columns: ReviewColumns, window_days: int = 7) -> Dict[str, Any]:
+    """Daily sentiment counts with trailing rolling negative share and mean score"""
+    if window_days < 1:
+        raise ValueError(f"window_days must be at least 1, got {window_days}")
+    valid = ~np.isnat(columns.date) & (columns.sentiment >= 0)
+    if not valid.any():
+        return {"window_days": window_days, "days": []}
+
+    day = columns.date[valid].astype('datetime64[D]')
+    first_day = day.min()
+    day_index = (day - first_day).astype(np.int64)
+    n_days = int(day_index.max()) + 1
+    n_sentiments = len(SENTIMENTS)
+
+    # Day x sentiment counts in one bincount over a flattened 2-D index
+    counts = np.bincount(day_index * n_sentiments + columns.sentiment[valid],
+                         minlength=n_days * n_sentiments).reshape(n_days, n_sentiments)
+    totals = counts.sum(axis=1)
+
+    score = columns.sentiment_score[valid]
+    has_score = ~np.isnan(score)
+    score_sums = np.bincount(day_index[has_score], weights=score[has_score], minlength=n_days)
+    score_counts = np.bincount(day_index[has_score], minlength=n_days)
+
+    def rolling(values):
+        """Trailing window sums via a cumulative sum"""
+        cumulative = np.cumsum(values)
+        result = cumulative.copy()
+        result[window_days:] -= cumulative[:-window_days]
+        return result
+
+    rolling_total = rolling(totals)
+    rolling_negative = rolling(counts[:, _NEGATIVE])
+    rolling_score_sum = rolling(score_sums)
+    rolling_score_count = rolling(score_counts)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        negative_share = rolling_negative / rolling_total
+        mean_score = rolling_score_sum / rolling_score_count
+
+    active = np.flatnonzero(totals)
+    dates = (first_day + active).astype(str)
+    return {
+        "window_days": window_days,
+        "days": [
+            {
+                "date": str(date),
+                "counts": {name: int(counts[i, SENTIMENTS.id_for(name)]) for name in SENTIMENT_NAMES},
+                "rolling_reviews": int(rolling_total[i]),
+                "rolling_negative_share": share,
+                "rolling_mean_sentiment_score": score_value
+            }
+            for date, i, share, score_value in zip(dates, active, _round_list(negative_share[active]),
+                                                  _round_list(mean_score[active]))
+        ]
+    }
+
+
+def rating_sentiment_conflicts(columns: ReviewColumns) -> Dict[str, Any]:
+    """Rating (1-5) x sentiment matrix plus the rating/text conflicts it reveals"""
+    rating = np.rint(columns.rating)
+    valid = (rating >= 1) & (rating <= 5) & (columns.sentiment >= 0)
+    n_sentiments = len(SENTIMENTS)
+    matrix = np.bincount((rating[valid].astype(np.int64) - 1) * n_sentiments + columns.sentiment[valid],
+                         minlength=5 * n_sentiments).reshape(5, n_sentiments)
+    row_totals = matrix.sum(axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        doubtful_rate = matrix[:, _DOUBTFUL] / row_totals
+
+    high_rating_negative = valid & (rating >= 4) & (columns.sentiment == _NEGATIVE)
+    low_rating_positive = valid & (rating <= 2) & (columns.sentiment == _POSITIVE)
+    return {
+        "matrix": {
+            str(r + 1): {name: int(matrix[r, SENTIMENTS.id_for(name)]) for name in SENTIMENT_NAMES}
+            for r in range(5)
+        },
+        "doubtful_rate_by_rating": dict(zip([str(r) for r in range(1, 6)], _round_list(doubtful_rate))),
+        "doubtful_count": int(matrix[:, _DOUBTFUL].sum()),
+        "high_rating_negative_count": int(high_rating_negative.sum()),
+        "low_rating_positive_count": int(low_rating_positive.sum())
+    }
+
+
+def dimension_severity_over_time(columns: ReviewColumns) -> Dict[str, Any]:
+    """Monthly count and mean review severity of negative mentions per dimension"""
+    rows = columns.mention_row
+    month = columns.date[rows].astype('datetime64[M]')
+    severity = columns.severity[rows]
+    valid = (columns.mention_sentiment == _NEGATIVE) & ~np.isnat(month)
+    if not valid.any():
+        return {}
+
+    month = month[valid]
+    dims = columns.mention_dimension[valid].astype(np.int64)
+    severity = severity[valid]
+    first_month = month.min()
+    month_index = (month - first_month).astype(np.int64)
+    n_months = int(month_index.max()) + 1
+    n_dims = len(DIMENSIONS)
+
+    flat = dims * n_months + month_index
+    counts = np.bincount(flat, minlength=n_dims * n_months).reshape(n_dims, n_months)
+    has_severity = ~np.isnan(severity)
+    severity_sums = np.bincount(flat[has_severity], weights=severity[has_severity],
+                                minlength=n_dims * n_months).reshape(n_dims, n_months)
+    severity_counts = np.bincount(flat[has_severity], minlength=n_dims * n_months).reshape(n_dims, n_months)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_severity = severity_sums / severity_counts
+
+    months = (first_month + np.arange(n_months)).astype(str)
+    report = {}
+    for dim_id in np.flatnonzero(counts.sum(axis=1)):
+        active = np.flatnonzero(counts[dim_id])
+        report[DIMENSIONS.label(int(dim_id))] = [
+            {"month": str(months[m]), "negative_mentions": int(counts[dim_id, m]), "average_severity": sev}
+            for m, sev in zip(active, _round_list(mean_severity[dim_id, active], 2))
+        ]
+    return report
+
+
+def author_breakdown(columns: ReviewColumns, top_n: int = 10) -> Dict[str, Any]:
+    """Local guide vs other reviewers, and the most prolific authors"""
+    def group(mask):
+        count = int(mask.sum())
+        ratings = columns.rating[mask]
+        scores = columns.sentiment_score[mask]
+        return {
+            "reviews": count,
+            "average_rating": round(float(np.nanmean(ratings)), 2) if count and not np.isnan(ratings).all() else 0,
+            "average_sentiment_score": round(float(np.nanmean(scores)), 3) if count and not np.isnan(scores).all() else 0,
+            "sentiment_counts": columns.sentiment_counts(mask)
+        }
+
+    author_counts = np.bincount(columns.author, minlength=len(columns.author_names))
+    named = np.array([bool(name) for name in columns.author_names], dtype=bool)
+    repeat = np.flatnonzero((author_counts > 1) & named)
+    top = repeat[np.argsort(-author_counts[repeat], kind='stable')][:top_n]
+    score_sums = np.bincount(columns.author, weights=np.nan_to_num(columns.sentiment_score),
+                             minlength=len(columns.author_names))
+
+    return {
+        "local_guide": group(columns.local_guide == 1),
+        "non_local_guide": group(columns.local_guide == 0),
+        "unknown_local_guide": int((columns.local_guide < 0).sum()),
+        "unique_authors": int(named.sum()),
+        "repeat_authors": int(len(repeat)),
+        "reviews_by_repeat_authors": int(author_counts[repeat].sum()),
+        "top_authors": [
+            {
+                "author": columns.author_names[a],
+                "reviews": int(author_counts[a]),
+                "average_sentiment_score": round(float(score_sums[a] / author_counts[a]), 3)
+            }
+            for a in top
+        ]
+    }
+
+
+def build_analytics_report(analyzed_reviews: Iterable[Dict[str, Any]], window_days: int = 7) -> Dict[str, Any]:
+    """Trend, conflict, dimension-severity and author reports for the results file"""
+    columns = ReviewColumns(analyzed_reviews)
+    return {
+        "review_count": len(columns),
+        "undated_reviews": int(np.isnat(columns.date).sum()),
+        "sentiment_trend": rolling_sentiment_trend(columns, window_days),
+        "rating_sentiment_conflicts": rating_sentiment_conflicts(columns),
+        "dimension_severity_over_time": dimension_severity_over_time(columns),
+        "author_breakdown": author_breakdown(columns)
+    }
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+from datetime import datetime
+from typing import List, Dict, Any, Iterable, Tuple
+
+
+DASHBOARD_SENTIMENTS = ["positive", "negative", "neutral", "doubtful"]
+DASHBOARD_DIMENSIONS = ["Service Quality", "Facility Experience", "Trust & Safety", "Clinical Care", "Operations"]
+SORT_ORDERS = ["date", "severity"]
+PAGE_PATH = "pages/{sentiment}/{dimension}/{sort}-{page}.json"
+
+
+def _name_hash(name: str) -> str:
+    return hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]
+
+
+def dimension_slug(name: str) -> str:
+    """File-system friendly dimension name, e.g. "Trust & Safety" -> "trust-safety"
+
+    Names without ASCII letters or digits (e.g. Arabic) become "dimension-<hash>".
+    """
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or f"dimension-{_name_hash(name)}"
+
+
+def dimension_slugs(names: Iterable[str]) -> Dict[str, str]:
+    """Distinct slug per dimension name, in order
+
+    A name whose slug is already taken ("Waiting Time" after "Waiting time")
+    gets a "-<hash>" suffix, so no two names ever share a page directory.
+    """
+    slugs: Dict[str, str] = {}
+    used = set()
+    for name in names:
+        slug = dimension_slug(name)
+        if slug in used:
+            base = slug = f"{slug}-{_name_hash(name)}"
+            suffix = 2
+            while slug in used:
+                slug = f"{base}-{suffix}"
+                suffix += 1
+        used.add(slug)
+        slugs[name] = slug
+    return slugs
+
+
+def _page_review(review: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields the dashboard renders for a review card"""
+    analysis = review.get('analysis', {})
+    return {
+        "review_id": review.get('review_id'),
+        "author": review.get('author', ''),
+        "rating": review.get('rating'),
+        "text": review.get('text', ''),
+        "date": review.get('date', ''),
+        "images": review.get('images', []),
+        "analysis": {
+            "sentiment": analysis.get('sentiment'),
+            "severity": analysis.get('severity', 0)
+        }
+    }
+
+
+def _combinations(review: Dict[str, Any]) -> Iterable[Tuple[str, str]]:
+    """(sentiment, dimension) lists a review appears under, matching refreshInsights in script.js
+
+    Positive/negative lists use the sentiment of the dimension mention; neutral
+    and doubtful lists use the review's overall sentiment.
+    """
+    analysis = review.get('analysis', {})
+    overall = analysis.get('sentiment')
+    seen = set()
+    for dim in analysis.get('dimensions', []):
+        name = dim.get('name')
+        if not isinstance(name, str):
+            continue
+        if dim.get('sentiment') in ('positive', 'negative'):
+            seen.add((dim['sentiment'], name))
+        if overall in ('neutral', 'doubtful'):
+            seen.add((overall, name))
+    return seen
+
+
+def _sort_keys(review: Dict[str, Any]) -> Tuple[str, float]:
+    date = review.get('date')
+    # Only ISO timestamps sort meaningfully; relative dates ("a year ago") go last
+    date_key = date if isinstance(date, str) and len(date) >= 10 and date[4] == '-' else ''
+    try:
+        severity = float(review.get('analysis', {}).get('severity') or 0)
+    except (TypeError, ValueError):
+        severity = 0.0
+    return date_key, severity
+
+
+def export_review_pages(analyzed_reviews: Iterable[Dict[str, Any]], sections: Dict[str, Any],
+                        output_dir: str, page_size: int = 50) -> Dict[str, Any]:
+    """Write pre-sorted review pages per (sentiment, dimension) plus a manifest
+
+    Layout under output_dir:
+      manifest.json  - counts and page counts per combination, page path template
+      summary.json   - every results section except the reviews (for first paint)
+      pages/<sentiment>/<dimension-slug>/<sort>-<n>.json - page n (1-based)
+    Pages are sorted newest first ("date") or most severe first, newest first
+    within a severity ("severity").
+    """
+    if page_size < 1:
+        raise ValueError(f"page_size must be at least 1, got {page_size}")
+    cards: List[Dict[str, Any]] = []
+    keys: List[Tuple[str, float]] = []
+    members: Dict[Tuple[str, str], List[int]] = {}
+
+    for review in analyzed_reviews:
+        combos = _combinations(review)
+        if not combos:
+            continue
+        index = len(cards)
+        cards.append(_page_review(review))
+        keys.append(_sort_keys(review))
+        for combo in combos:
+            members.setdefault(combo, []).append(index)
+
+    # Build into a scratch directory and swap it in, so stale pages never linger
+    pages_dir = os.path.join(output_dir, 'pages')
+    scratch_dir = pages_dir + '.tmp'
+    shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    dimension_names = DASHBOARD_DIMENSIONS + sorted({d for _, d in members} - set(DASHBOARD_DIMENSIONS))
+    slugs = dimension_slugs(dimension_names)
+    counts: Dict[str, Dict[str, Dict[str, int]]] = {}
+    for sentiment in DASHBOARD_SENTIMENTS:
+        counts[sentiment] = {}
+        for dimension in dimension_names:
+            indices = members.get((sentiment, dimension), [])
+            total_pages = (len(indices) + page_size - 1) // page_size
+            counts[sentiment][dimension] = {"count": len(indices), "pages": total_pages}
+            if not indices:
+                continue
+
+            orders = {
+                "date": sorted(indices, key=lambda i: keys[i][0], reverse=True),
+                "severity": sorted(indices, key=lambda i: (keys[i][1], keys[i][0]), reverse=True)
+            }
+            directory = os.path.join(scratch_dir, sentiment, slugs[dimension])
+            os.makedirs(directory, exist_ok=True)
+            for sort, ordered in orders.items():
+                for page in range(total_pages):
+                    chunk = ordered[page * page_size:(page + 1) * page_size]
+                    with open(os.path.join(directory, f"{sort}-{page + 1}.json"), 'w', encoding='utf-8') as f:
+                        json.dump({
+                            "sentiment": sentiment,
+                            "dimension": dimension,
+                            "sort": sort,
+                            "page": page + 1,
+                            "total_pages": total_pages,
+                            "total": len(indices),
+                            "reviews": [cards[i] for i in chunk]
+                        }, f, ensure_ascii=False, separators=(',', ':'))
+
+    os.makedirs(output_dir, exist_ok=True)
+    shutil.rmtree(pages_dir, ignore_errors=True)
+    if os.path.isdir(scratch_dir):
+        os.replace(scratch_dir, pages_dir)
+
+    with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(sections, f, ensure_ascii=False, separators=(',', ':'))
+
+    manifest = {
+        "generated_at": datetime.now().isoformat(),
+        "total_reviews": sections.get('metadata', {}).get('total_reviews', len(cards)),
+        "indexed_reviews": len(cards),
+        "page_size": page_size,
+        "sort_orders": SORT_ORDERS,
+        "page_path": PAGE_PATH,
+        "summary_path": "summary.json",
+        "dimensions": slugs,
+        "counts": counts
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    return manifest
@@ -1,13 +1,21 @@
 import json
-import openai
 import time
 import argparse
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Tuple
 import os
+import sys
 from pathlib import Path
 import re
 
+# Heavy or optional modules (openai, sqlite3) are imported inside the code paths
+# that need them so the offline subcommands start instantly and need no API client.
+from alerts import AlertSink, prioritize_reviews
+from records import AnalyzedReview, AnalyzedReviewList
+from summary_cache import SummaryCache, multiset_key, summary_fingerprint
+from results_io import (ResultsFileWriter, JsonlResultsWriter, iter_analyzed_reviews, iter_results_file,
+                        read_results_sections, review_index_path)
+
 
 def chunk_list(lst, chunk_size):
     """Yield successive chunks of size chunk_size from list"""
@@ -15,10 +23,115 @@ def chunk_list(lst, chunk_size):
         yield lst[i:i + chunk_size]
 
 
+# Bump when the summary prompt templates change so cached summaries are not reused
+SUMMARY_TEMPLATE_VERSION = 1
+
+ANALYSIS_SYSTEM_MESSAGE = "You are an expert sentiment analyst fluent in both Arabic and English. Respond with ONLY valid JSON. No explanatory text before or after the JSON."
+
+# Analysis instructions and JSON schema shared by both prompt profiles, so
+# "prefix" and "legacy" always ask the model exactly the same thing
+ANALYSIS_INSTRUCTIONS = """**Analysis Instructions:**
+
+1. **Primary Classification:**
+   - If review text exists: Analyze both text sentiment and rating
+   - If review text is empty: Base classification solely on rating
+   - Rating scale: 1-2 (negative), 3 (neutral), 4-5 (positive)
+
+2. **Language Handling:**
+   - If the review is in Arabic, analyze it in Arabic but respond in English
+   - Preserve original Arabic text meaning in the analysis
+   - Key points should reflect the original Arabic sentiment
+
+3. **Conflict Detection:**
+   - If text sentiment contradicts rating, classify as "doubtful"
+   - Consider rating vs text sentiment alignment
+
+4. **Sentiment Dimensions Analysis:**
+   Identify which dimensions are mentioned:
+   - **Service Quality**: Staff behavior, communication, responsiveness
+   - **Facility Experience**: Cleanliness, infrastructure, amenities
+   - **Clinical Care**: Treatment quality, medical outcomes
+   - **Operations**: Scheduling, billing, administrative processes
+   - **Trust & Safety**: Safety protocols, privacy, reliability
+
+RESPOND WITH ONLY VALID JSON IN THIS EXACT FORMAT:
+{
+  "text": Actual Text you reviewd,  
+  "sentiment": "positive/negative/neutral/doubtful",
+  "confidence": 0.0,
+  "sentiment_score": 0.0,
+  "dimensions": [
+    {
+      "name": "dimension_name",
+      "sentiment": "positive/negative/neutral",
+      "key_points": ["point1", "point2"]
+    }
+  ],
+  "key_themes": ["theme1", "theme2"],
+  "severity": 0,
+  "summary": "Brief analysis summary"
+}
+
+**Guidelines:**
+- sentiment_score: -1.0 (very negative) to +1.0 (very positive)
+- confidence: 0.0 to 1.0 (certainty in classification)
+- severity: 1-5 (only for negative sentiment, 1=minor, 5=critical)
+- Include only relevant dimensions that are actually mentioned
+- If no text, note "Analysis based on rating only" in summary
+- For Arabic text, ensure analysis captures cultural context
+"""
+
+# Invariant analysis instructions for the "prefix" prompt profile. They are sent
+# as an identical system message on every request, ahead of the per-review
+# payload, so provider-side prompt prefix caching can reuse them.
+ANALYSIS_PREFIX_INSTRUCTIONS = ANALYSIS_SYSTEM_MESSAGE + """
+
+Analyze the review in the user message using both the review text and rating to provide comprehensive sentiment analysis. The user message gives the review text, the rating out of 5 and the detected language.
+
+""" + ANALYSIS_INSTRUCTIONS
+
+# "prefix": static instructions in the system message, only the review in the user message
+# "legacy": the original layout with the review interpolated ahead of the instructions
+PROMPT_PROFILES = ["prefix", "legacy"]
+
+# Analysis model cascade: cheapest first, escalating to the last (strongest) stage
+DEFAULT_CASCADE = [
+    {"model": "gpt-4o-mini", "confidence_threshold": 0.75, "max_tokens": 1000},
+    {"model": "gpt-4", "confidence_threshold": 0.0, "max_tokens": 1000}
+]
+
+
 class ReviewSentimentAnalyzer:
-    def __init__(self, openai_api_key: str):
-        """Initialize the analyzer with OpenAI API key"""
+    def __init__(self, openai_api_key: str, cascade: List[Dict[str, Any]] = None,
+                 long_review_chars: int = 600, theme_index=None,
+                 summary_cache: SummaryCache = None, summary_model: str = "gpt-4",
+                 prompt_profile: str = "prefix", token_log=None):
+        """Initialize the analyzer with OpenAI API key
+
+        cascade is an ordered list of stages ({"model", "confidence_threshold",
+        "max_tokens", "temperature"}), cheapest first; the last stage is the
+        strong model every escalation ends at. theme_index (a themes.ThemeIndex)
+        canonicalizes themes and key points for the stats and summary prompts.
+        summary_cache memoizes summaries by input fingerprint (in-memory by default).
+        prompt_profile is one of PROMPT_PROFILES; token_log is an optional open text
+        file that receives one JSON line of token usage per analysis request.
+        """
+        if prompt_profile not in PROMPT_PROFILES:
+            raise ValueError(f"Unknown prompt profile: {prompt_profile}")
+        
+        import openai
+        
         self.client = openai.OpenAI(api_key=openai_api_key)
+        self.cascade = cascade or DEFAULT_CASCADE
+        self.long_review_chars = long_review_chars
+        self.theme_index = theme_index
+        self.summary_cache = summary_cache if summary_cache is not None else SummaryCache()
+        self.summary_model = summary_model
+        self.prompt_profile = prompt_profile
+        self.token_log = token_log
+        self._reset_cascade_stats()
+        
+        self.required_fields = ['sentiment', 'confidence', 'sentiment_score', 'dimensions', 'key_themes', 'severity', 'summary']
         
         # Define sentiment analysis dimensions
         self.analysis_dimensions = [
@@ -77,74 +190,197 @@ class ReviewSentimentAnalyzer:
         return f"{name}_{date}".replace(' ', '_').replace('/', '_')
 
     
-    def analyze_single_review(self, review: Dict[str, Any], retry_count: int = 2) -> Dict[str, Any]:
-        """Analyze sentiment for a single review with retry logic"""
-        
-        review_text = review.get('text', '')
-        rating = review.get('rating', 0)
+    def _format_review_input(self, review_text: str, rating: Any) -> str:
+        """The per-review lines of the prompt: text, rating and detected language"""
         
         # Check if the text appears to be in Arabic
         has_arabic = bool(re.search(r'[\u0600-\u06FF]', review_text))
         
-        prompt = f"""
+        return f"""- Review Text: "{review_text}"
+- Rating: {rating}/5
+- Language: {"Arabic" if has_arabic else "English/Other"}"""
+
+    def _build_analysis_prompt(self, review_text: str, rating: Any) -> str:
+        """Build the per-review analysis prompt (legacy profile: review first, then the instructions)"""
+        return f"""
 Analyze this review using both the review text and rating to provide comprehensive sentiment analysis:
 
 **Input:**
-- Review Text: "{review_text}"
-- Rating: {rating}/5
-- Language: {"Arabic" if has_arabic else "English/Other"}
+{self._format_review_input(review_text, rating)}
 
-**Analysis Instructions:**
+""" + ANALYSIS_INSTRUCTIONS
 
-1. **Primary Classification:**
-   - If review text exists: Analyze both text sentiment and rating
-   - If review text is empty: Base classification solely on rating
-   - Rating scale: 1-2 (negative), 3 (neutral), 4-5 (positive)
+    def _build_analysis_messages(self, review_text: str, rating: Any) -> List[Dict[str, str]]:
+        """Build the chat messages for one review in the configured prompt profile"""
+        if self.prompt_profile == "legacy":
+            return [
+                {"role": "system", "content": ANALYSIS_SYSTEM_MESSAGE},
+                {"role": "user", "content": self._build_analysis_prompt(review_text, rating)}
+            ]
+        
+        return [
+            {"role": "system", "content": ANALYSIS_PREFIX_INSTRUCTIONS},
+            {"role": "user", "content": self._format_review_input(review_text, rating)}
+        ]
 
-2. **Language Handling:**
-   - If the review is in Arabic, analyze it in Arabic but respond in English
-   - Preserve original Arabic text meaning in the analysis
-   - Key points should reflect the original Arabic sentiment
+    def _is_hard_review(self, review_text: str) -> bool:
+        """Long or mixed-language reviews go straight to the strongest model"""
+        if len(review_text) > self.long_review_chars:
+            return True
+        has_arabic = bool(re.search(r'[\u0600-\u06FF]', review_text))
+        has_latin = bool(re.search(r'[A-Za-z]{3,}', review_text))
+        return has_arabic and has_latin
 
-3. **Conflict Detection:**
-   - If text sentiment contradicts rating, classify as "doubtful"
-   - Consider rating vs text sentiment alignment
+    def _reset_cascade_stats(self):
+        self.cascade_stats = [
+            {
+                "model": stage["model"],
+                "confidence_threshold": stage.get("confidence_threshold", 0.0),
+                "requests": 0,
+                "resolved": 0,
+                "escalated": 0,
+                "routed_direct": 0,
+                "latency_seconds": 0.0,
+                "prompt_tokens": 0,
+                "cached_prompt_tokens": 0,
+                "completion_tokens": 0
+            }
+            for stage in self.cascade
+        ]
 
-4. **Sentiment Dimensions Analysis:**
-   Identify which dimensions are mentioned:
-   - **Service Quality**: Staff behavior, communication, responsiveness
-   - **Facility Experience**: Cleanliness, infrastructure, amenities
-   - **Clinical Care**: Treatment quality, medical outcomes
-   - **Operations**: Scheduling, billing, administrative processes
-   - **Trust & Safety**: Safety protocols, privacy, reliability
+    def get_cascade_report(self) -> Dict[str, Any]:
+        """Per-tier counts, latency and token spend for the metadata"""
+        tiers = []
+        for stats in self.cascade_stats:
+            tier = dict(stats)
+            tier["latency_seconds"] = round(stats["latency_seconds"], 3)
+            tier["avg_latency_seconds"] = round(stats["latency_seconds"] / stats["requests"], 3) if stats["requests"] else 0
+            tier["avg_prompt_tokens"] = round(stats["prompt_tokens"] / stats["requests"], 1) if stats["requests"] else 0
+            tier["total_tokens"] = stats["prompt_tokens"] + stats["completion_tokens"]
+            tiers.append(tier)
+        return {
+            "prompt_profile": self.prompt_profile,
+            "long_review_chars": self.long_review_chars,
+            "tiers": tiers
+        }
 
-RESPOND WITH ONLY VALID JSON IN THIS EXACT FORMAT:
-{{
-  "text": Actual Text you reviewd,  
-  "sentiment": "positive/negative/neutral/doubtful",
-  "confidence": 0.0,
-  "sentiment_score": 0.0,
-  "dimensions": [
-    {{
-      "name": "dimension_name",
-      "sentiment": "positive/negative/neutral",
-      "key_points": ["point1", "point2"]
-    }}
-  ],
-  "key_themes": ["theme1", "theme2"],
-  "severity": 0,
-  "summary": "Brief analysis summary"
-}}
+    def _call_analysis_model(self, messages: List[Dict[str, str]], stage_index: int) -> Dict[str, Any]:
+        """Send the analysis messages to one cascade stage and parse the JSON reply"""
+        stage = self.cascade[stage_index]
+        stats = self.cascade_stats[stage_index]
+        
+        start_time = time.time()
+        stats["requests"] += 1
+        try:
+            response = self.client.chat.completions.create(
+                model=stage["model"],
+                messages=messages,
+                temperature=stage.get("temperature", 0.3),
+                max_tokens=stage.get("max_tokens", 1000)
+            )
+        finally:
+            latency = time.time() - start_time
+            stats["latency_seconds"] += latency
+        
+        usage = getattr(response, 'usage', None)
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        cached_tokens = getattr(getattr(usage, 'prompt_tokens_details', None), 'cached_tokens', 0) or 0
+        stats["prompt_tokens"] += prompt_tokens
+        stats["cached_prompt_tokens"] += cached_tokens
+        stats["completion_tokens"] += completion_tokens
+        
+        if self.token_log:
+            self.token_log.write(json.dumps({
+                "model": stage["model"],
+                "prompt_profile": self.prompt_profile,
+                "prompt_chars": sum(len(m["content"]) for m in messages),
+                "prompt_tokens": prompt_tokens,
+                "cached_prompt_tokens": cached_tokens,
+                "completion_tokens": completion_tokens,
+                "latency_seconds": round(latency, 3)
+            }) + "\n")
+            self.token_log.flush()
+        
+        # Get raw response
+        raw_response = response.choices[0].message.content
+        if not raw_response:
+            raise ValueError("Empty response from OpenAI")
+        
+        # Clean and parse the JSON response
+        cleaned_response = self._clean_openai_response(raw_response)
+        return json.loads(cleaned_response)
 
-**Guidelines:**
-- sentiment_score: -1.0 (very negative) to +1.0 (very positive)
-- confidence: 0.0 to 1.0 (certainty in classification)
-- severity: 1-5 (only for negative sentiment, 1=minor, 5=critical)
-- Include only relevant dimensions that are actually mentioned
-- If no text, note "Analysis based on rating only" in summary
-- For Arabic text, ensure analysis captures cultural context
-"""
+    def _escalation_reason(self, analysis_result: Dict[str, Any], stage: Dict[str, Any]) -> str:
+        """Return why a cheaper tier's answer is not good enough, or '' if it is"""
+        missing = [f for f in self.required_fields if f not in analysis_result]
+        if missing:
+            return f"missing fields {missing}"
+        if analysis_result.get('sentiment') not in ('positive', 'negative', 'neutral', 'doubtful'):
+            return f"invalid sentiment {analysis_result.get('sentiment')!r}"
+        if analysis_result.get('sentiment') == 'doubtful':
+            return "doubtful sentiment"
+        try:
+            confidence = float(analysis_result.get('confidence'))
+        except (TypeError, ValueError):
+            return "invalid confidence"
+        if confidence < stage.get("confidence_threshold", 0.0):
+            return f"confidence {confidence} below {stage['confidence_threshold']}"
+        return ""
 
+    def _build_review_result(self, review: Dict[str, Any], analysis_result: Dict[str, Any],
+                             model: str) -> Dict[str, Any]:
+        """Wrap a model analysis with the original review data in the expected format"""
+        return {
+            "review_id": self._extract_review_id(review),
+            "author": review.get('name', ''),
+            "rating": review.get('rating', 0),
+            "text": review.get('text', ''),  # Preserve original text (Arabic or English)
+            "date": review.get('date', ''),
+            "images": review.get('images', []),  # Include images if available
+            "local_guide": review.get('local_guide', False),
+            "analysis": analysis_result,
+            "analysis_model": model,
+            "processed_at": datetime.now().isoformat()
+        }
+    
+    def analyze_single_review(self, review: Dict[str, Any], retry_count: int = 2) -> Dict[str, Any]:
+        """Analyze sentiment for a single review through the model cascade
+
+        Each cheaper tier gets a single attempt; its answer is escalated to the next
+        tier when it is doubtful, under the tier's confidence threshold or fails
+        validation. Long and mixed-language reviews skip straight to the last tier,
+        which keeps the retry and fallback behaviour.
+        """
+        
+        review_text = review.get('text', '')
+        rating = review.get('rating', 0)
+        messages = self._build_analysis_messages(review_text, rating)
+        
+        final_index = len(self.cascade) - 1
+        stage_index = 0
+        if final_index > 0 and self._is_hard_review(review_text):
+            stage_index = final_index
+            self.cascade_stats[final_index]["routed_direct"] += 1
+        
+        while stage_index < final_index:
+            stage = self.cascade[stage_index]
+            try:
+                analysis_result = self._call_analysis_model(messages, stage_index)
+                reason = self._escalation_reason(analysis_result, stage)
+            except json.JSONDecodeError as e:
+                reason = f"JSON parsing error: {e}"
+            except Exception as e:
+                reason = f"API error: {e}"
+            
+            if not reason:
+                self.cascade_stats[stage_index]["resolved"] += 1
+                return self._build_review_result(review, analysis_result, stage["model"])
+            
+            print(f"  Escalating from {stage['model']}: {reason}")
+            self.cascade_stats[stage_index]["escalated"] += 1
+            stage_index += 1
+        
         for attempt in range(retry_count + 1):
             try:
                 # Add exponential backoff for retries
@@ -153,53 +389,15 @@ RESPOND WITH ONLY VALID JSON IN THIS EXACT FORMAT:
                     print(f"  Retrying in {wait_time} seconds... (attempt {attempt + 1})")
                     time.sleep(wait_time)
                 
-                response = self.client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[
-                        {
-                            "role": "system", 
-                            "content": "You are an expert sentiment analyst fluent in both Arabic and English. Respond with ONLY valid JSON. No explanatory text before or after the JSON."
-                        },
-                        {
-                            "role": "user", 
-                            "content": prompt
-                        }
-                    ],
-                    temperature=0.3,
-                    max_tokens=1000
-                )
-                
-                # Get raw response
-                raw_response = response.choices[0].message.content
-                if not raw_response:
-                    raise ValueError("Empty response from OpenAI")
-                
-                # Clean and parse the JSON response
-                cleaned_response = self._clean_openai_response(raw_response)
-                analysis_result = json.loads(cleaned_response)
+                analysis_result = self._call_analysis_model(messages, final_index)
                 
                 # Validate required fields
-                required_fields = ['sentiment', 'confidence', 'sentiment_score', 'dimensions', 'key_themes', 'severity', 'summary']
-                for field in required_fields:
+                for field in self.required_fields:
                     if field not in analysis_result:
                         analysis_result[field] = [] if field in ['dimensions', 'key_themes'] else 0 if field in ['confidence', 'sentiment_score', 'severity'] else 'unknown'
                 
-                # Extract review ID
-                review_id = self._extract_review_id(review)
-                
-                # Add original review data to the result in the expected format
-                result = {
-                    "review_id": review_id,
-                    "author": review.get('name', ''),
-                    "rating": rating,
-                    "text": review_text,  # Preserve original text (Arabic or English)
-                    "date": review.get('date', ''),
-                    "images": review.get('images', []),  # Include images if available
-                    "analysis": analysis_result,
-                    "processed_at": datetime.now().isoformat()
-                }
-                
-                return result
+                self.cascade_stats[final_index]["resolved"] += 1
+                return self._build_review_result(review, analysis_result, self.cascade[final_index]["model"])
                 
             except json.JSONDecodeError as e:
                 error_msg = f"JSON parsing error (attempt {attempt + 1}): {e}"
@@ -243,6 +441,7 @@ RESPOND WITH ONLY VALID JSON IN THIS EXACT FORMAT:
             "text": review.get('text', ''),
             "date": review.get('date', ''),
             "images": review.get('images', []),
+            "local_guide": review.get('local_guide', False),
             "analysis": {
                 "sentiment": sentiment,
                 "confidence": 0.3,
@@ -256,6 +455,60 @@ RESPOND WITH ONLY VALID JSON IN THIS EXACT FORMAT:
             "error": error_msg
         }
     
+    def _condense_key_points(self, points: List[Tuple[Any, str]], limit: int = 50) -> List[str]:
+        """Key points for a summary prompt - canonical "point (count)" entries when a theme index is set
+
+        points are (key point, sentiment of its dimension mention) pairs; points
+        only fold together when they were made with the same sentiment.
+        """
+        if self.theme_index is None:
+            return [point for point, _ in points[:limit]]
+        counts = {}
+        for pair in points:
+            if isinstance(pair[0], str):
+                counts[pair] = counts.get(pair, 0) + 1
+        return [f"{label} ({count})" for label, count in self.theme_index.canonical_counts(counts)[:limit]]
+    
+    def _generate_summary(self, summary_prompt: str, fingerprint_inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a summary prompt, reusing the cached answer when its inputs are unchanged"""
+        cache_key = summary_fingerprint(
+            template_version=SUMMARY_TEMPLATE_VERSION,
+            model=self.summary_model,
+            # Any setting that changes how key points are folded changes the prompt
+            theme_index=None if self.theme_index is None else {
+                "threshold": self.theme_index.threshold,
+                "dims": self.theme_index.dims,
+                "ngram": self.theme_index.ngram
+            },
+            **fingerprint_inputs
+        )
+        cached = self.summary_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        response = self.client.chat.completions.create(
+            model=self.summary_model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are an expert healthcare analyst fluent in Arabic and English. Generate concise, actionable summaries in valid JSON format only."
+                },
+                {
+                    "role": "user",
+                    "content": summary_prompt
+                }
+            ],
+            temperature=0.3,
+            max_tokens=800
+        )
+        
+        raw_response = response.choices[0].message.content
+        cleaned_response = self._clean_openai_response(raw_response)
+        summary_result = json.loads(cleaned_response)
+        
+        self.summary_cache.put(cache_key, summary_result)
+        return summary_result
+    
     def generate_sentiment_summaries(self, analyzed_reviews: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Generate AI-powered summaries for positive and negative reviews"""
         
@@ -277,7 +530,8 @@ RESPOND WITH ONLY VALID JSON IN THIS EXACT FORMAT:
             
             # Prepare data for summary generation
             dimensions_data = {}
-            all_key_points = []
+            dimension_points = {}
+            all_points = []
             
             for review in filtered_reviews:
                 analysis = review.get('analysis', {})
@@ -297,7 +551,14 @@ RESPOND WITH ONLY VALID JSON IN THIS EXACT FORMAT:
                     
                     dimensions_data[dim_name]['count'] += 1
                     dimensions_data[dim_name]['key_points'].extend(key_points)
-                    all_key_points.extend(key_points)
+                    points = [(point, dim_sentiment) for point in key_points]
+                    dimension_points.setdefault(dim_name, []).extend(points)
+                    all_points.extend(points)
+            
+            # Fold near-duplicate points so the prompt carries each idea once
+            if self.theme_index is not None:
+                for dim_name, dim_data in dimensions_data.items():
+                    dim_data['key_points'] = self._condense_key_points(dimension_points[dim_name])
             
             # Create summary prompt
             summary_prompt = f"""
@@ -309,7 +570,7 @@ Based on the following {sentiment_type} review analysis, generate a comprehensiv
 {json.dumps(dimensions_data, indent=2)}
 
 **All Key Points:**
-{all_key_points[:50]}  # Limit to avoid token limits
+{self._condense_key_points(all_points)}  # Limit to avoid token limits
 
 Generate a summary in the following JSON format:
 {{
@@ -349,25 +610,16 @@ Generate a summary in the following JSON format:
 """
             
             try:
-                response = self.client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are an expert healthcare analyst fluent in Arabic and English. Generate concise, actionable summaries in valid JSON format only."
-                        },
-                        {
-                            "role": "user",
-                            "content": summary_prompt
-                        }
-                    ],
-                    temperature=0.3,
-                    max_tokens=800
-                )
-                
-                raw_response = response.choices[0].message.content
-                cleaned_response = self._clean_openai_response(raw_response)
-                summary_result = json.loads(cleaned_response)
+                summary_result = self._generate_summary(summary_prompt, {
+                    "kind": "sentiment",
+                    "sentiment": sentiment_type,
+                    "review_count": len(filtered_reviews),
+                    "dimensions": {
+                        name: {**data, "key_points": multiset_key(data['key_points'])}
+                        for name, data in dimensions_data.items()
+                    },
+                    "key_points": multiset_key(all_points)
+                })
                 
                 summaries[sentiment_type] = summary_result
                 
@@ -420,7 +672,7 @@ Based on the following {sentiment_type} mentions in the {dimension} dimension:
 **Review Count:** {review_count}
 
 **All Key Points:**
-{key_points[:50]}  # Limit to avoid token limits
+{self._condense_key_points([(point, sentiment_type) for point in key_points])}  # Limit to avoid token limits
 
 Generate a summary in the following JSON format:
 {{
@@ -461,25 +713,13 @@ Generate a summary in the following JSON format:
 """
                 
                 try:
-                    response = self.client.chat.completions.create(
-                        model="gpt-4",
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": "You are an expert healthcare analyst fluent in Arabic and English. Generate concise, actionable summaries in valid JSON format only."
-                            },
-                            {
-                                "role": "user",
-                                "content": summary_prompt
-                            }
-                        ],
-                        temperature=0.3,
-                        max_tokens=800
-                    )
-                    
-                    raw_response = response.choices[0].message.content
-                    cleaned_response = self._clean_openai_response(raw_response)
-                    summary_result = json.loads(cleaned_response)
+                    summary_result = self._generate_summary(summary_prompt, {
+                        "kind": "dimension",
+                        "dimension": dimension,
+                        "sentiment": sentiment_type,
+                        "review_count": review_count,
+                        "key_points": multiset_key(key_points)
+                    })
                     
                     summary_result["review_count"] = review_count
                     dimension_summaries[dimension][sentiment_type] = summary_result
@@ -496,30 +736,76 @@ Generate a summary in the following JSON format:
         return dimension_summaries
     
     def batch_analyze_reviews(self, reviews: List[Dict[str, Any]], 
-                            rate_limit_delay: float = 1.0) -> Dict[str, Any]:
-        """Analyze multiple reviews and generate comprehensive report"""
+                            rate_limit_delay: float = 1.0,
+                            prioritize: bool = True,
+                            alert_sink: AlertSink = None,
+                            analytics: bool = False,
+                            trend_window_days: int = 7,
+                            work_queue=None,
+                            worker_id: str = None) -> Dict[str, Any]:
+        """Analyze multiple reviews and generate comprehensive report
+
+        With prioritize=True reviews are analyzed low-rating/recent/long first so
+        severe complaints surface early; results keep the input order. Results are
+        held as compact records and returned as an AnalyzedReviewList, which yields
+        plain dicts on access.
+
+        With a work_queue.WorkQueue the reviews are enqueued (or an existing queue
+        for them is resumed) and this process works on the queue alongside any
+        other workers, then waits for the queue to drain before building the report.
+        """
         
         print(f"Starting analysis of {len(reviews)} reviews...")
         
-        analyzed_reviews = []
+        self._reset_cascade_stats()
+        order = prioritize_reviews(reviews) if prioritize else list(range(len(reviews)))
         failed_count = 0
         
-        for i, review in enumerate(reviews):
-            print(f"Processing review {i+1}/{len(reviews)}")
-            
-            result = self.analyze_single_review(review)
-            analyzed_reviews.append(result)
+        if work_queue is not None:
+            added = work_queue.enqueue(reviews, order, [self._extract_review_id(r) for r in reviews])
+            print(f"Work queue {work_queue.db_path}: {'enqueued' if added else 'resuming'} {len(work_queue)} tasks")
+            self.work_on_queue(work_queue, worker_id, rate_limit_delay, alert_sink, wait=True)
             
-            if 'error' in result:
-                failed_count += 1
+            analyzed_reviews = AnalyzedReviewList()
+            for review, result, error in work_queue.iter_results():
+                if result is None:
+                    result = self._create_fallback_analysis(review, error or "Not analyzed")
+                analyzed_reviews.append(result)
+                if 'error' in result:
+                    failed_count += 1
+        else:
+            results_by_index = {}
+            for position, i in enumerate(order):
+                print(f"Processing review {position+1}/{len(reviews)}")
+                
+                result = self.analyze_single_review(reviews[i])
+                results_by_index[i] = AnalyzedReview.from_dict(result)
+                
+                if 'error' in result:
+                    failed_count += 1
+                elif alert_sink:
+                    alert_sink.emit(result)
+                
+                # Rate limiting to avoid API limits
+                if position < len(reviews) - 1:  # Don't sleep after last review
+                    time.sleep(rate_limit_delay)
             
-            # Rate limiting to avoid API limits
-            if i < len(reviews) - 1:  # Don't sleep after last review
-                time.sleep(rate_limit_delay)
+            analyzed_reviews = AnalyzedReviewList(results_by_index.pop(i) for i in range(len(reviews)))
         
         # Generate summary statistics
         summary_stats = self._generate_summary_stats(analyzed_reviews)
         
+        # Columnar trend/conflict/severity/author reports (needs numpy); a
+        # reporting failure must not cost the analyses already paid for
+        analytics_report = None
+        if analytics:
+            try:
+                from analytics import build_analytics_report
+                
+                analytics_report = build_analytics_report(analyzed_reviews, window_days=trend_window_days)
+            except Exception as e:
+                print(f"Warning: analytics report skipped: {e}")
+        
         # Generate AI-powered sentiment summaries
         sentiment_summaries = self.generate_sentiment_summaries(analyzed_reviews)
         
@@ -533,91 +819,148 @@ Generate a summary in the following JSON format:
                 "successfully_analyzed": len(analyzed_reviews) - failed_count,
                 "failed_analyses": failed_count,
                 "analysis_date": datetime.now().isoformat(),
-                "processing_time_per_review": rate_limit_delay
+                "processing_time_per_review": rate_limit_delay,
+                "prioritized": prioritize,
+                "alerts_emitted": alert_sink.emitted_count if alert_sink else 0,
+                "model_cascade": self.get_cascade_report(),
+                "summary_cache": self.summary_cache.get_stats()
             },
-            "summary_statistics": summary_stats,
-            "sentiment_summaries": sentiment_summaries,
-            "dimension_summaries": dimension_summaries,
-            "analyzed_reviews": analyzed_reviews
+            "summary_statistics": summary_stats
         }
+        if work_queue is not None:
+            output["metadata"]["work_queue"] = work_queue.get_stats()
+        if analytics_report is not None:
+            output["analytics"] = analytics_report
+        output["sentiment_summaries"] = sentiment_summaries
+        output["dimension_summaries"] = dimension_summaries
+        output["analyzed_reviews"] = analyzed_reviews
         
         return output
     
+    def work_on_queue(self, work_queue, worker_id: str = None, rate_limit_delay: float = 1.0,
+                      alert_sink: AlertSink = None, wait: bool = False, poll_seconds: float = 5.0) -> int:
+        """Claim and analyze queued reviews until none are left to claim
+
+        With wait=True keep polling while other workers hold leases, taking over
+        any that expire, until the queue is drained. Returns the number of
+        results this worker wrote back.
+        """
+        from work_queue import default_worker_id
+        
+        worker_id = worker_id or default_worker_id()
+        total = len(work_queue)
+        processed = 0
+        
+        while True:
+            tasks = work_queue.claim(worker_id)
+            if not tasks:
+                if not wait or work_queue.is_drained():
+                    break
+                time.sleep(poll_seconds)
+                continue
+            
+            for task in tasks:
+                print(f"[{worker_id}] Processing review {task['position']+1}/{total} (attempt {task['attempt']})")
+                
+                result = self.analyze_single_review(task['review'])
+                if not work_queue.complete(task['position'], worker_id, result):
+                    print(f"[{worker_id}] Lease on review {task['position']+1} expired and was reclaimed; "
+                          "result discarded")
+                    continue
+                processed += 1
+                if 'error' not in result and alert_sink:
+                    alert_sink.emit(result)
+                
+                time.sleep(rate_limit_delay)
+        
+        print(f"[{worker_id}] Wrote back {processed} results")
+        return processed
+    
     def _generate_summary_stats(self, analyzed_reviews: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Generate summary statistics from analyzed reviews"""
+        return generate_summary_stats(analyzed_reviews, self.theme_index)
+
+def generate_summary_stats(analyzed_reviews: Iterable[Dict[str, Any]], theme_index=None) -> Dict[str, Any]:
+    """Generate summary statistics from analyzed reviews (a single pass, so a stream works)
+
+    With a themes.ThemeIndex, top_themes counts canonical themes instead of exact strings.
+    """
+    
+    total_reviews = 0
+
+    # Count sentiment distribution
+    sentiment_counts = {"positive": 0, "negative": 0, "neutral": 0, "doubtful": 0}
+    sentiment_scores = []
+    theme_counts = {}
+    dimension_mentions = {}
+    severity_scores = []
+    rating_distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
+    
+    for review in analyzed_reviews:
+        total_reviews += 1
+        analysis = review.get('analysis', {})
         
-        total_reviews = len(analyzed_reviews)
-        if total_reviews == 0:
-            return {}
+        # Sentiment distribution
+        sentiment = analysis.get('sentiment', 'neutral')
+        sentiment_counts[sentiment] = sentiment_counts.get(sentiment, 0) + 1
         
-        # Count sentiment distribution
-        sentiment_counts = {"positive": 0, "negative": 0, "neutral": 0, "doubtful": 0}
-        sentiment_scores = []
-        all_themes = []
-        dimension_mentions = {}
-        severity_scores = []
-        rating_distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
+        # Sentiment scores
+        if 'sentiment_score' in analysis:
+            sentiment_scores.append(analysis['sentiment_score'])
         
-        for review in analyzed_reviews:
-            analysis = review.get('analysis', {})
-            
-            # Sentiment distribution
-            sentiment = analysis.get('sentiment', 'neutral')
-            sentiment_counts[sentiment] = sentiment_counts.get(sentiment, 0) + 1
-            
-            # Sentiment scores
-            if 'sentiment_score' in analysis:
-                sentiment_scores.append(analysis['sentiment_score'])
-            
-            # Themes
-            themes = analysis.get('key_themes', [])
-            all_themes.extend(themes)
-            
-            # Dimensions
-            dimensions = analysis.get('dimensions', [])
-            for dim in dimensions:
-                dim_name = dim.get('name', '')
-                if dim_name:
-                    dimension_mentions[dim_name] = dimension_mentions.get(dim_name, 0) + 1
-            
-            # Severity (for negative reviews)
-            if sentiment == 'negative' and 'severity' in analysis:
-                severity_scores.append(analysis['severity'])
-            
-            # Rating distribution
-            rating = review.get('rating', 0)
-            if 1 <= rating <= 5:
-                rating_distribution[rating] += 1
-        
-        # Calculate percentages
-        sentiment_percentages = {
-            k: round((v / total_reviews) * 100, 2) 
-            for k, v in sentiment_counts.items()
-        }
+        # Themes
+        for theme in analysis.get('key_themes', []):
+            # The theme index only merges themes from reviews with the same sentiment
+            key = (theme, sentiment) if theme_index is not None else theme
+            theme_counts[key] = theme_counts.get(key, 0) + 1
         
-        # Most common themes
-        theme_counts = {}
-        for theme in all_themes:
-            theme_counts[theme] = theme_counts.get(theme, 0) + 1
+        # Dimensions
+        dimensions = analysis.get('dimensions', [])
+        for dim in dimensions:
+            dim_name = dim.get('name', '')
+            if dim_name:
+                dimension_mentions[dim_name] = dimension_mentions.get(dim_name, 0) + 1
         
-        top_themes = sorted(theme_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+        # Severity (for negative reviews)
+        if sentiment == 'negative' and 'severity' in analysis:
+            severity_scores.append(analysis['severity'])
         
-        # Most mentioned dimensions
-        top_dimensions = sorted(dimension_mentions.items(), key=lambda x: x[1], reverse=True)[:5]
-        
-        return {
-            "sentiment_distribution": {
-                "counts": sentiment_counts,
-                "percentages": sentiment_percentages
-            },
-            "average_sentiment_score": round(sum(sentiment_scores) / len(sentiment_scores), 3) if sentiment_scores else 0,
-            "rating_distribution": rating_distribution,
-            "average_rating": round(sum(k * v for k, v in rating_distribution.items()) / total_reviews, 2),
-            "top_themes": top_themes,
-            "top_dimensions": top_dimensions,
-            "average_severity": round(sum(severity_scores) / len(severity_scores), 2) if severity_scores else 0,
-            "high_severity_count": len([s for s in severity_scores if s >= 4])
-        }
+        # Rating distribution
+        rating = review.get('rating', 0)
+        if 1 <= rating <= 5:
+            rating_distribution[rating] += 1
+    
+    if total_reviews == 0:
+        return {}
+    
+    # Calculate percentages
+    sentiment_percentages = {
+        k: round((v / total_reviews) * 100, 2) 
+        for k, v in sentiment_counts.items()
+    }
+    
+    # Most common themes
+    if theme_index is not None:
+        top_themes = theme_index.canonical_counts(theme_counts)[:10]
+    else:
+        top_themes = sorted(theme_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+    
+    # Most mentioned dimensions
+    top_dimensions = sorted(dimension_mentions.items(), key=lambda x: x[1], reverse=True)[:5]
+    
+    return {
+        "sentiment_distribution": {
+            "counts": sentiment_counts,
+            "percentages": sentiment_percentages
+        },
+        "average_sentiment_score": round(sum(sentiment_scores) / len(sentiment_scores), 3) if sentiment_scores else 0,
+        "rating_distribution": rating_distribution,
+        "average_rating": round(sum(k * v for k, v in rating_distribution.items()) / total_reviews, 2),
+        "top_themes": top_themes,
+        "top_dimensions": top_dimensions,
+        "average_severity": round(sum(severity_scores) / len(severity_scores), 2) if severity_scores else 0,
+        "high_severity_count": len([s for s in severity_scores if s >= 4])
+    }
 
 def load_reviews_from_file(file_path: str) -> List[Dict[str, Any]]:
     """Load reviews from JSON file - handles the new input format"""
@@ -650,26 +993,171 @@ def load_reviews_from_file(file_path: str) -> List[Dict[str, Any]]:
         raise ValueError(f"Invalid JSON file: {file_path}")
 
 def save_analysis_results(results: Dict[str, Any], output_path: str):
-    """Save analysis results to JSON file"""
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    """Save analysis results to JSON file, one review at a time, with its review_id index"""
+    with ResultsFileWriter(output_path, index_path=review_index_path(output_path)) as writer:
+        for key, value in results.items():
+            if key != 'analyzed_reviews':
+                writer.write_section(key, value)
+        for review in results.get('analyzed_reviews', []):
+            writer.write_review(review)
     print(f"Analysis results saved to: {output_path}")
 
-def main():
-    parser = argparse.ArgumentParser(description='Analyze sentiment of reviews using OpenAI API')
-    parser.add_argument('input_file', help='Path to input JSON file containing reviews')
-    parser.add_argument('-o', '--output', help='Output file path (default: analysis_results.json)', 
-                       default='analysis_results.json')
-    parser.add_argument('-k', '--api-key', help='OpenAI API key (or set OPENAI_API_KEY env var)')
-    parser.add_argument('-d', '--delay', type=float, default=1.0, 
-                       help='Delay between API calls in seconds (default: 1.0)')
+def print_analysis_summary(results: Dict[str, Any]):
+    """Print a human-readable summary of an analysis results document"""
+    stats = results['summary_statistics']
+    summaries = results.get('sentiment_summaries', {})
+    dimension_summaries = results.get('dimension_summaries', {})
     
-    args = parser.parse_args()
+    print("\n" + "="*50)
+    print("ANALYSIS SUMMARY")
+    print("="*50)
+    print(f"Total Reviews: {results['metadata']['total_reviews']}")
+    print(f"Successfully Analyzed: {results['metadata']['successfully_analyzed']}")
+    print(f"Failed Analyses: {results['metadata']['failed_analyses']}")
+    print(f"Average Rating: {stats.get('average_rating', 0)}/5")
+    print(f"Average Sentiment Score: {stats.get('average_sentiment_score', 0)}")
     
-    # Get API key
+    cache_stats = results['metadata'].get('summary_cache')
+    if cache_stats:
+        print(f"Summary Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+              f"(hit rate {cache_stats['hit_rate']})")
+    
+    cascade_tiers = results['metadata'].get('model_cascade', {}).get('tiers', [])
+    if cascade_tiers:
+        print("\nModel Cascade:")
+    for tier in cascade_tiers:
+        print(f"  {tier['model']}: {tier['resolved']} resolved, {tier['escalated']} escalated, "
+              f"{tier['requests']} requests, {tier['avg_latency_seconds']}s avg, {tier['total_tokens']} tokens "
+              f"({tier.get('avg_prompt_tokens', 0)} prompt/request, {tier.get('cached_prompt_tokens', 0)} cached)")
+    
+    print("\nSentiment Distribution:")
+    for sentiment, percentage in stats.get('sentiment_distribution', {}).get('percentages', {}).items():
+        print(f"  {sentiment.title()}: {percentage}%")
+    
+    print(f"\nTop Themes:")
+    for theme, count in stats.get('top_themes', [])[:5]:
+        print(f"  {theme}: {count} mentions")
+    
+    # Print AI-generated overall summaries
+    if summaries:
+        print(f"\nOVERALL SENTIMENT INSIGHTS:")
+        for sentiment_type, summary_data in summaries.items():
+            print(f"\n{sentiment_type.upper()} REVIEWS:")
+            print(f"  Summary: {summary_data.get('summary', 'N/A')}")
+            print(f"  Key Insights:")
+            for insight in summary_data.get('key_insights', [])[:3]:  # Show first 3 insights
+                print(f"    • {insight}")
+    
+    # Print dimension-wise summaries
+    if dimension_summaries:
+        print(f"\nDIMENSION-WISE INSIGHTS:")
+        for dimension, sentiment_data in dimension_summaries.items():
+            print(f"\n{dimension.upper()}:")
+            for sentiment_type in ['positive', 'negative']:
+                if sentiment_type in sentiment_data:
+                    data = sentiment_data[sentiment_type]
+                    review_count = data.get('review_count', 0)
+                    if review_count > 0:
+                        print(f"  {sentiment_type.title()} ({review_count} reviews):")
+                        print(f"    Summary: {data.get('summary', 'N/A')}")
+                        insights = data.get('key_insights', [])
+                        if insights:
+                            print(f"    Top Insight: {insights[0]}")
+
+
+def _load_theme_index(args):
+    """Load (or start) the persistent theme index when --theme-index is given"""
+    if not args.theme_index:
+        return None
+    from themes import ThemeIndex
+    
+    theme_index = ThemeIndex.load(args.theme_index, threshold=args.theme_threshold)
+    print(f"Loaded theme index with {len(theme_index)} canonical themes from: {args.theme_index}")
+    return theme_index
+
+
+def _save_theme_index(theme_index, args):
+    if theme_index is not None:
+        theme_index.save(args.theme_index)
+        print(f"Saved theme index with {len(theme_index)} canonical themes to: {args.theme_index}")
+
+
+def _add_theme_index_arguments(parser):
+    parser.add_argument('--theme-index',
+                        help='Persistent theme index file; canonicalizes themes/key points for stats and summaries (needs numpy)')
+    parser.add_argument('--theme-threshold', type=float,
+                        help='Cosine similarity needed to merge a theme into a canonical one (default: 0.7)')
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def _add_analytics_arguments(parser):
+    parser.add_argument('--analytics', action='store_true',
+                        help='Add trend, rating/sentiment conflict, dimension severity and author reports (needs numpy)')
+    parser.add_argument('--trend-window', type=_positive_int, default=7,
+                        help='Rolling window in days for the sentiment trend (default: 7)')
+
+
+def _add_alert_arguments(parser):
+    parser.add_argument('--alerts-file', help='Append high-severity negative reviews to this JSONL file as they are found')
+    parser.add_argument('--alert-webhook', help='POST each high-severity alert as JSON to this URL')
+    parser.add_argument('--alert-severity', type=int, default=4,
+                        help='Minimum severity of a negative review to raise an alert (default: 4)')
+
+
+def _build_alert_sink(args):
+    if args.alerts_file or args.alert_webhook:
+        return AlertSink(args.alerts_file, args.alert_webhook, min_severity=args.alert_severity)
+    return None
+
+
+def _add_model_arguments(parser):
+    parser.add_argument('--fast-model', default=DEFAULT_CASCADE[0]['model'],
+                        help=f"Model tried first for each review (default: {DEFAULT_CASCADE[0]['model']})")
+    parser.add_argument('--strong-model', default=DEFAULT_CASCADE[-1]['model'],
+                        help=f"Model used for escalated reviews (default: {DEFAULT_CASCADE[-1]['model']})")
+    parser.add_argument('--confidence-threshold', type=float, default=DEFAULT_CASCADE[0]['confidence_threshold'],
+                        help=f"Escalate fast-model answers below this confidence (default: {DEFAULT_CASCADE[0]['confidence_threshold']})")
+    parser.add_argument('--long-review-chars', type=int, default=600,
+                        help='Reviews longer than this go straight to the strong model (default: 600)')
+    parser.add_argument('--cascade-config',
+                        help='JSON file with the full list of cascade stages (overrides the model/threshold flags)')
+    parser.add_argument('--no-cascade', action='store_true',
+                        help='Send every review to the strong model only')
+    parser.add_argument('--prompt-profile', choices=PROMPT_PROFILES, default='prefix',
+                        help='prefix: static instructions first for prompt caching, legacy: original layout (default: prefix)')
+    parser.add_argument('--token-log', help='Append per-request token usage and latency to this JSONL file')
+
+
+def _build_cascade(args) -> List[Dict[str, Any]]:
+    if args.cascade_config:
+        with open(args.cascade_config, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    if args.no_cascade:
+        return [{"model": args.strong_model, "confidence_threshold": 0.0, "max_tokens": 1000}]
+    return [
+        {"model": args.fast_model, "confidence_threshold": args.confidence_threshold, "max_tokens": 1000},
+        {"model": args.strong_model, "confidence_threshold": 0.0, "max_tokens": 1000}
+    ]
+
+
+def _get_api_key(args):
     api_key = args.api_key or os.getenv('OPENAI_API_KEY')
     if not api_key:
         print("Error: OpenAI API key is required. Set OPENAI_API_KEY environment variable or use -k flag.")
+    return api_key
+
+
+def run_analyze(args):
+    """Analyze reviews with the OpenAI API and save the results"""
+    # Get API key
+    api_key = _get_api_key(args)
+    if not api_key:
         return
     
     try:
@@ -678,67 +1166,355 @@ def main():
         reviews = load_reviews_from_file(args.input_file)
         print(f"Loaded {len(reviews)} reviews")
         
+        # Fail before any API call if the analytics report cannot be built
+        if args.analytics:
+            import analytics
+        
         # Initialize analyzer
-        analyzer = ReviewSentimentAnalyzer(api_key)
+        theme_index = _load_theme_index(args)
+        summary_cache = SummaryCache(args.summary_cache, max_entries=args.summary_cache_size)
+        token_log = open(args.token_log, 'a', encoding='utf-8') if args.token_log else None
+        analyzer = ReviewSentimentAnalyzer(api_key, cascade=_build_cascade(args),
+                                           long_review_chars=args.long_review_chars,
+                                           theme_index=theme_index, summary_cache=summary_cache,
+                                           prompt_profile=args.prompt_profile, token_log=token_log)
+        
+        # Set up early alert emission
+        alert_sink = _build_alert_sink(args)
+        
+        # Shared work queue for additional "work" processes
+        work_queue = None
+        if args.queue:
+            from work_queue import WorkQueue
+            
+            work_queue = WorkQueue(args.queue, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
         
         # Analyze reviews
-        results = analyzer.batch_analyze_reviews(reviews, rate_limit_delay=args.delay)
+        try:
+            results = analyzer.batch_analyze_reviews(reviews, rate_limit_delay=args.delay,
+                                                     prioritize=not args.no_priority,
+                                                     alert_sink=alert_sink,
+                                                     analytics=args.analytics,
+                                                     trend_window_days=args.trend_window,
+                                                     work_queue=work_queue,
+                                                     worker_id=args.worker_id)
+        finally:
+            if alert_sink:
+                alert_sink.close()
+            if token_log:
+                token_log.close()
+            if work_queue is not None:
+                work_queue.close()
         
         # Save results
         save_analysis_results(results, args.output)
+        _save_theme_index(theme_index, args)
+        summary_cache.save()
+        if args.db:
+            from result_store import ResultStore
+            
+            with ResultStore(args.db) as store:
+                count = store.save_results(results)
+            print(f"Upserted {count} new or changed reviews into: {args.db}")
         
         # Print summary
-        stats = results['summary_statistics']
-        summaries = results.get('sentiment_summaries', {})
-        dimension_summaries = results.get('dimension_summaries', {})
-        
-        print("\n" + "="*50)
-        print("ANALYSIS SUMMARY")
-        print("="*50)
-        print(f"Total Reviews: {results['metadata']['total_reviews']}")
-        print(f"Successfully Analyzed: {results['metadata']['successfully_analyzed']}")
-        print(f"Failed Analyses: {results['metadata']['failed_analyses']}")
-        print(f"Average Rating: {stats.get('average_rating', 0)}/5")
-        print(f"Average Sentiment Score: {stats.get('average_sentiment_score', 0)}")
-        
-        print("\nSentiment Distribution:")
-        for sentiment, percentage in stats.get('sentiment_distribution', {}).get('percentages', {}).items():
-            print(f"  {sentiment.title()}: {percentage}%")
-        
-        print(f"\nTop Themes:")
-        for theme, count in stats.get('top_themes', [])[:5]:
-            print(f"  {theme}: {count} mentions")
-        
-        # Print AI-generated overall summaries
-        if summaries:
-            print(f"\nOVERALL SENTIMENT INSIGHTS:")
-            for sentiment_type, summary_data in summaries.items():
-                print(f"\n{sentiment_type.upper()} REVIEWS:")
-                print(f"  Summary: {summary_data.get('summary', 'N/A')}")
-                print(f"  Key Insights:")
-                for insight in summary_data.get('key_insights', [])[:3]:  # Show first 3 insights
-                    print(f"    • {insight}")
-        
-        # Print dimension-wise summaries
-        if dimension_summaries:
-            print(f"\nDIMENSION-WISE INSIGHTS:")
-            for dimension, sentiment_data in dimension_summaries.items():
-                print(f"\n{dimension.upper()}:")
-                for sentiment_type in ['positive', 'negative']:
-                    if sentiment_type in sentiment_data:
-                        data = sentiment_data[sentiment_type]
-                        review_count = data.get('review_count', 0)
-                        if review_count > 0:
-                            print(f"  {sentiment_type.title()} ({review_count} reviews):")
-                            print(f"    Summary: {data.get('summary', 'N/A')}")
-                            insights = data.get('key_insights', [])
-                            if insights:
-                                print(f"    Top Insight: {insights[0]}")
+        print_analysis_summary(results)
         
         print(f"\nResults saved to: {args.output}")
         
     except Exception as e:
         print(f"Error: {e}")
 
+
+def run_work(args):
+    """Work on the queue of a running "analyze --queue" job until nothing is left to claim"""
+    api_key = _get_api_key(args)
+    if not api_key:
+        return
+    if not os.path.exists(args.queue_db):
+        print(f"Error: queue database not found: {args.queue_db}")
+        return
+    
+    from work_queue import WorkQueue
+    
+    token_log = open(args.token_log, 'a', encoding='utf-8') if args.token_log else None
+    analyzer = ReviewSentimentAnalyzer(api_key, cascade=_build_cascade(args),
+                                       long_review_chars=args.long_review_chars,
+                                       prompt_profile=args.prompt_profile, token_log=token_log)
+    alert_sink = _build_alert_sink(args)
+    
+    with WorkQueue(args.queue_db) as work_queue:
+        try:
+            analyzer.work_on_queue(work_queue, args.worker_id, rate_limit_delay=args.delay,
+                                   alert_sink=alert_sink, wait=args.wait)
+        finally:
+            if alert_sink:
+                alert_sink.close()
+            if token_log:
+                token_log.close()
+        stats = work_queue.get_stats()
+    print(f"Queue depth: {stats['depth']} of {stats['tasks']} tasks, {stats['retries']} retries")
+
+
+def run_recompute_stats(args):
+    """Recompute summary_statistics for an existing results file without any API calls"""
+    output_path = args.output or args.results_file
+    
+    # Single streamed pass: keep the small sections, fold reviews into the stats
+    theme_index = _load_theme_index(args)
+    sections = {}
+    summary_stats = {}
+    for key, value in iter_results_file(args.results_file):
+        if key == 'analyzed_reviews':
+            summary_stats = generate_summary_stats(value, theme_index)
+        else:
+            sections[key] = value
+    
+    sections['summary_statistics'] = summary_stats
+    sections.setdefault('metadata', {})['stats_recomputed_at'] = datetime.now().isoformat()
+    
+    if args.analytics:
+        from analytics import build_analytics_report
+        
+        sections['analytics'] = build_analytics_report(iter_analyzed_reviews(args.results_file),
+                                                       window_days=args.trend_window)
+    
+    tmp_path = output_path + '.tmp'
+    with ResultsFileWriter(tmp_path, index_path=review_index_path(output_path)) as writer:
+        for key in ('metadata', 'summary_statistics', 'analytics'):
+            if key in sections:
+                writer.write_section(key, sections.pop(key))
+        for key, value in sections.items():
+            writer.write_section(key, value)
+        for review in iter_analyzed_reviews(args.results_file):
+            writer.write_review(review)
+    os.replace(tmp_path, output_path)  # Safe even when the output is the input
+    _save_theme_index(theme_index, args)
+    
+    print(f"Recomputed summary statistics saved to: {output_path}")
+    print_analysis_summary(read_results_sections(output_path))
+
+
+def run_export(args):
+    """Re-export an existing results file for the dashboard or other consumers"""
+    reviews = iter_analyzed_reviews(args.results_file)
+    count = 0
+    
+    if args.format == 'jsonl':
+        with JsonlResultsWriter(args.output, index_path=review_index_path(args.output)) as writer:
+            for review in reviews:
+                writer.write_review(review)
+                count += 1
+    
+    elif args.format == 'pages':
+        from dashboard_export import export_review_pages
+        
+        sections = read_results_sections(args.results_file)
+        manifest = export_review_pages(reviews, sections, args.output, page_size=args.page_size)
+        count = manifest['indexed_reviews']
+        pages = sum(c['pages'] for dims in manifest['counts'].values() for c in dims.values())
+        print(f"Wrote {pages} pages per sort order and manifest.json to: {args.output}")
+    
+    elif args.format == 'csv':
+        import csv
+        
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['review_id', 'author', 'rating', 'date', 'sentiment', 'confidence',
+                             'sentiment_score', 'severity', 'dimensions', 'key_themes', 'summary', 'text'])
+            for review in reviews:
+                analysis = review.get('analysis', {})
+                writer.writerow([
+                    review.get('review_id', ''), review.get('author', ''), review.get('rating', ''),
+                    review.get('date', ''), analysis.get('sentiment', ''), analysis.get('confidence', ''),
+                    analysis.get('sentiment_score', ''), analysis.get('severity', ''),
+                    '; '.join(d.get('name', '') for d in analysis.get('dimensions', [])),
+                    '; '.join(str(t) for t in analysis.get('key_themes', [])),
+                    analysis.get('summary', ''), review.get('text', '')
+                ])
+                count += 1
+    
+    else:
+        # Dashboard JSON: same document, optionally without indentation
+        tmp_path = args.output + '.tmp'
+        with ResultsFileWriter(tmp_path, indent=None if args.compact else 2,
+                               index_path=review_index_path(args.output)) as writer:
+            for key, value in iter_results_file(args.results_file):
+                if key == 'analyzed_reviews':
+                    for review in value:
+                        writer.write_review(review)
+                        count += 1
+                else:
+                    writer.write_section(key, value)
+        os.replace(tmp_path, args.output)
+    
+    print(f"Exported {count} reviews to: {args.output}")
+
+
+def run_merge(args):
+    """Merge several results files, later files winning on duplicate review_id"""
+    
+    # Pass 1: find the last occurrence of every review_id and the newest summaries
+    last_seen = {}
+    sections = {}
+    for file_index, file_path in enumerate(args.results_files):
+        for key, value in iter_results_file(file_path):
+            if key == 'analyzed_reviews':
+                for review_index, review in enumerate(value):
+                    last_seen[review.get('review_id')] = (file_index, review_index)
+            elif key in ('sentiment_summaries', 'dimension_summaries'):
+                sections[key] = value
+    
+    def merged_reviews():
+        for file_index, file_path in enumerate(args.results_files):
+            for review_index, review in enumerate(iter_analyzed_reviews(file_path)):
+                if last_seen.get(review.get('review_id')) == (file_index, review_index):
+                    yield review
+    
+    # Pass 2: statistics over the de-duplicated reviews
+    failed_count = 0
+    total_count = 0
+    for review in merged_reviews():
+        total_count += 1
+        if 'error' in review:
+            failed_count += 1
+    summary_stats = generate_summary_stats(merged_reviews())
+    
+    metadata = {
+        "total_reviews": total_count,
+        "successfully_analyzed": total_count - failed_count,
+        "failed_analyses": failed_count,
+        "analysis_date": datetime.now().isoformat(),
+        "merged_from": list(args.results_files)
+    }
+    
+    # Pass 3: write the merged document
+    tmp_path = args.output + '.tmp'
+    with ResultsFileWriter(tmp_path, index_path=review_index_path(args.output)) as writer:
+        writer.write_section('metadata', metadata)
+        writer.write_section('summary_statistics', summary_stats)
+        for key in ('sentiment_summaries', 'dimension_summaries'):
+            if key in sections:
+                writer.write_section(key, sections[key])
+        for review in merged_reviews():
+            writer.write_review(review)
+    os.replace(tmp_path, args.output)
+    
+    print(f"Merged {total_count} unique reviews from {len(args.results_files)} files into: {args.output}")
+    if sections:
+        print("Note: sentiment/dimension summaries were copied from the newest input; "
+              "re-run analyze to regenerate them for the merged data.")
+
+
+def run_lookup(args):
+    """Fetch reviews by review_id through the results file's sidecar index"""
+    from results_io import IndexedResults
+    
+    review_ids = list(args.review_ids)
+    if args.ids_file:
+        with open(args.ids_file, 'r', encoding='utf-8') as f:
+            review_ids.extend(line.strip() for line in f if line.strip())
+    
+    with IndexedResults(args.results_file) as results:
+        reviews = results.get_many(review_ids)
+    
+    missing = [review_id for review_id, review in zip(review_ids, reviews) if review is None]
+    found = [review for review in reviews if review is not None]
+    if args.output:
+        with JsonlResultsWriter(args.output, index_path=review_index_path(args.output)) as writer:
+            for review in found:
+                writer.write_review(review)
+        print(f"Exported {len(found)} reviews to: {args.output}")
+    else:
+        print(json.dumps(found[0] if len(review_ids) == 1 and found else found, ensure_ascii=False, indent=2))
+    if missing:
+        print(f"Not found: {', '.join(missing)}", file=sys.stderr)
+
+
+COMMANDS = ['analyze', 'work', 'recompute-stats', 'export', 'merge', 'lookup']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze sentiment of reviews using OpenAI API')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    analyze_parser = subparsers.add_parser('analyze', help='Analyze reviews with the OpenAI API (default command)')
+    analyze_parser.add_argument('input_file', help='Path to input JSON file containing reviews')
+    analyze_parser.add_argument('-o', '--output', help='Output file path (default: analysis_results.json)', 
+                       default='analysis_results.json')
+    analyze_parser.add_argument('-k', '--api-key', help='OpenAI API key (or set OPENAI_API_KEY env var)')
+    analyze_parser.add_argument('-d', '--delay', type=float, default=1.0, 
+                       help='Delay between API calls in seconds (default: 1.0)')
+    analyze_parser.add_argument('--no-priority', action='store_true',
+                       help='Analyze reviews in file order instead of severity-first priority order')
+    _add_alert_arguments(analyze_parser)
+    _add_model_arguments(analyze_parser)
+    analyze_parser.add_argument('--summary-cache',
+                       help='Persistent summary cache file; unchanged summary inputs reuse the cached summary')
+    analyze_parser.add_argument('--summary-cache-size', type=int, default=256,
+                       help='Maximum cached summaries kept, least recently used evicted first (default: 256)')
+    _add_analytics_arguments(analyze_parser)
+    analyze_parser.add_argument('--db', help='Also upsert results into this SQLite database (see scripts/result_store.py)')
+    _add_theme_index_arguments(analyze_parser)
+    analyze_parser.add_argument('--queue',
+                       help='SQLite work queue shared with "work" processes; created, or resumed if it exists')
+    analyze_parser.add_argument('--worker-id', help='Worker name in queue stats (default: <hostname>-<pid>)')
+    analyze_parser.add_argument('--lease-seconds', type=float,
+                       help='Seconds before an unfinished claimed review is handed to another worker (default: 300)')
+    analyze_parser.add_argument('--max-attempts', type=int,
+                       help='Attempts per review before its failure is final (default: 3)')
+    analyze_parser.set_defaults(func=run_analyze)
+    
+    work_parser = subparsers.add_parser('work', help='Extra worker for the queue of an "analyze --queue" run')
+    work_parser.add_argument('queue_db', help='Path to the queue database')
+    work_parser.add_argument('-k', '--api-key', help='OpenAI API key (or set OPENAI_API_KEY env var)')
+    work_parser.add_argument('-d', '--delay', type=float, default=1.0,
+                             help='Delay between API calls in seconds (default: 1.0)')
+    work_parser.add_argument('--worker-id', help='Worker name in queue stats (default: <hostname>-<pid>)')
+    work_parser.add_argument('--wait', action='store_true',
+                             help='Keep polling until the queue is drained, taking over expired leases')
+    _add_model_arguments(work_parser)
+    _add_alert_arguments(work_parser)
+    work_parser.set_defaults(func=run_work)
+    
+    stats_parser = subparsers.add_parser('recompute-stats',
+                                         help='Recompute summary statistics of a results file (offline)')
+    stats_parser.add_argument('results_file', help='Path to analysis results JSON file')
+    stats_parser.add_argument('-o', '--output', help='Output file path (default: overwrite the input)')
+    _add_theme_index_arguments(stats_parser)
+    _add_analytics_arguments(stats_parser)
+    stats_parser.set_defaults(func=run_recompute_stats)
+    
+    export_parser = subparsers.add_parser('export', help='Re-export a results file (offline)')
+    export_parser.add_argument('results_file', help='Path to analysis results JSON file')
+    export_parser.add_argument('-o', '--output', required=True, help='Output file path (a directory for pages)')
+    export_parser.add_argument('-f', '--format', choices=['json', 'jsonl', 'csv', 'pages'], default='json',
+                               help='json: dashboard results file, jsonl: one review per line, csv: flat table, '
+                                    'pages: pre-sorted dashboard pages per sentiment/dimension (default: json)')
+    export_parser.add_argument('--compact', action='store_true', help='Write json without indentation')
+    export_parser.add_argument('--page-size', type=_positive_int, default=50,
+                               help='Reviews per page for the pages format (default: 50, the dashboard list size)')
+    export_parser.set_defaults(func=run_export)
+    
+    merge_parser = subparsers.add_parser('merge', help='Merge results files, de-duplicating by review_id (offline)')
+    merge_parser.add_argument('results_files', nargs='+', help='Results files, oldest first')
+    merge_parser.add_argument('-o', '--output', required=True, help='Output file path')
+    merge_parser.set_defaults(func=run_merge)
+    
+    lookup_parser = subparsers.add_parser('lookup', help='Fetch reviews by review_id using the sidecar index (offline)')
+    lookup_parser.add_argument('results_file', help='Results file (.json or .jsonl) with a .idx file next to it')
+    lookup_parser.add_argument('review_ids', nargs='*', help='Review ids to fetch')
+    lookup_parser.add_argument('--ids-file', help='File with one review_id per line')
+    lookup_parser.add_argument('-o', '--output', help='Write the reviews found to this JSONL file instead of printing')
+    lookup_parser.set_defaults(func=run_lookup)
+    
+    # Keep the original "main.py <input_file> ..." invocation working as "analyze"
+    argv = sys.argv[1:]
+    if argv and argv[0] not in COMMANDS and argv[0] not in ('-h', '--help'):
+        argv = ['analyze'] + argv
+    
+    args = parser.parse_args(argv)
+    args.func(args)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,265 @@
+import sys
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence
+
+
+class _Missing:
+    """Marker for a field that was absent from the source dict"""
+    __slots__ = ()
+
+    def __repr__(self):
+        return '<missing>'
+
+
+MISSING = _Missing()
+
+
+class LabelTable:
+    """Small-integer ids for a bounded set of repeated labels
+
+    Known labels get fixed ids; anything new the model invents is appended,
+    so every distinct label is stored once however many records use it.
+    """
+
+    def __init__(self, labels: Iterable[str] = ()):
+        self._labels: List[str] = []
+        self._ids: Dict[str, int] = {}
+        for label in labels:
+            self.id_for(label)
+
+    def id_for(self, label: str) -> int:
+        label_id = self._ids.get(label)
+        if label_id is None:
+            label_id = len(self._labels)
+            label = sys.intern(label)
+            self._labels.append(label)
+            self._ids[label] = label_id
+        return label_id
+
+    def label(self, label_id: int) -> str:
+        return self._labels[label_id]
+
+    def __len__(self):
+        return len(self._labels)
+
+
+SENTIMENTS = LabelTable(["positive", "negative", "neutral", "doubtful"])
+DIMENSIONS = LabelTable(["Service Quality", "Facility Experience", "Clinical Care", "Operations", "Trust & Safety"])
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _intern_strings(values: Any) -> Any:
+    """Intern a list of strings as a tuple; anything unexpected is kept as-is"""
+    if isinstance(values, list) and all(isinstance(v, str) for v in values):
+        return tuple(sys.intern(v) for v in values)
+    return values
+
+
+def _strings_to_json(values: Any) -> Any:
+    return list(values) if isinstance(values, tuple) else values
+
+
+# Encoded fields hold an int id for the common case; any other source value is
+# boxed in a 1-tuple so it can never be mistaken for an id on the way out.
+
+def _encode_label(table: LabelTable, value: Any) -> Any:
+    return table.id_for(value) if isinstance(value, str) else (value,)
+
+
+def _decode_label(table: LabelTable, value: Any) -> Any:
+    return value[0] if isinstance(value, tuple) else table.label(value)
+
+
+def _encode_timestamp(value: Any) -> Any:
+    """Store naive ISO timestamps as integer microseconds since the epoch"""
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return (value,)
+        if parsed.tzinfo is None and parsed.isoformat() == value:
+            return (parsed - _EPOCH) // timedelta(microseconds=1)
+    return (value,)
+
+
+def _decode_timestamp(value: Any) -> Any:
+    return value[0] if isinstance(value, tuple) else (_EPOCH + timedelta(microseconds=value)).isoformat()
+
+
+class DimensionMention:
+    """One dimension mentioned in a review analysis"""
+
+    __slots__ = ('name', 'sentiment', 'key_points', 'extra')
+
+    def __init__(self, name: Any, sentiment: Any, key_points: Any, extra: Optional[Dict[str, Any]] = None):
+        self.name = name            # DIMENSIONS id (or raw value if not a string)
+        self.sentiment = sentiment  # SENTIMENTS id (or raw value)
+        self.key_points = key_points
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'DimensionMention':
+        data = dict(data)
+        name = data.pop('name', MISSING)
+        sentiment = data.pop('sentiment', MISSING)
+        key_points = data.pop('key_points', MISSING)
+        return cls(
+            _encode_label(DIMENSIONS, name) if name is not MISSING else MISSING,
+            _encode_label(SENTIMENTS, sentiment) if sentiment is not MISSING else MISSING,
+            _intern_strings(key_points),
+            data or None
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {}
+        if self.name is not MISSING:
+            result['name'] = _decode_label(DIMENSIONS, self.name)
+        if self.sentiment is not MISSING:
+            result['sentiment'] = _decode_label(SENTIMENTS, self.sentiment)
+        if self.key_points is not MISSING:
+            result['key_points'] = _strings_to_json(self.key_points)
+        if self.extra:
+            result.update(self.extra)
+        return result
+
+
+class ReviewAnalysis:
+    """Model output for one review"""
+
+    __slots__ = ('text', 'sentiment', 'confidence', 'sentiment_score', 'dimensions',
+                 'key_themes', 'severity', 'summary', 'extra')
+
+    # Serialization order of the known fields (the prompt's schema order)
+    FIELDS = ('text', 'sentiment', 'confidence', 'sentiment_score', 'dimensions',
+              'key_themes', 'severity', 'summary')
+
+    def __init__(self):
+        for field in self.__slots__:
+            setattr(self, field, MISSING)
+        self.extra = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], review_text: Any = None) -> 'ReviewAnalysis':
+        data = dict(data)
+        analysis = cls()
+        for field in cls.FIELDS:
+            setattr(analysis, field, data.pop(field, MISSING))
+
+        # The model usually echoes the review text; share the review's copy then
+        if analysis.text is not MISSING and analysis.text == review_text:
+            analysis.text = review_text
+        if analysis.sentiment is not MISSING:
+            analysis.sentiment = _encode_label(SENTIMENTS, analysis.sentiment)
+        if isinstance(analysis.dimensions, list) and all(isinstance(d, dict) for d in analysis.dimensions):
+            analysis.dimensions = tuple(DimensionMention.from_dict(d) for d in analysis.dimensions)
+        analysis.key_themes = _intern_strings(analysis.key_themes)
+        analysis.extra = data or None
+        return analysis
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if value is MISSING:
+                continue
+            if field == 'sentiment':
+                value = _decode_label(SENTIMENTS, value)
+            elif field == 'dimensions' and isinstance(value, tuple):
+                value = [d.to_dict() for d in value]
+            elif field == 'key_themes':
+                value = _strings_to_json(value)
+            result[field] = value
+        if self.extra:
+            result.update(self.extra)
+        return result
+
+
+class AnalyzedReview:
+    """An analyzed review, kept compact until it is serialized
+
+    Labels and dimension names are small ids, repeated strings are interned and
+    processed_at is an integer; to_dict() rebuilds the analysis_results.json
+    record exactly.
+    """
+
+    __slots__ = ('review_id', 'author', 'rating', 'text', 'date', 'images', 'local_guide', 'analysis',
+                 'analysis_model', 'processed_at', 'error', 'extra')
+
+    FIELDS = ('review_id', 'author', 'rating', 'text', 'date', 'images', 'local_guide', 'analysis',
+              'analysis_model', 'processed_at', 'error')
+
+    def __init__(self):
+        for field in self.__slots__:
+            setattr(self, field, MISSING)
+        self.extra = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'AnalyzedReview':
+        data = dict(data)
+        review = cls()
+        for field in cls.FIELDS:
+            setattr(review, field, data.pop(field, MISSING))
+
+        if isinstance(review.author, str):
+            review.author = sys.intern(review.author)
+        if isinstance(review.analysis_model, str):
+            review.analysis_model = sys.intern(review.analysis_model)
+        if review.images == []:
+            review.images = ()
+        if isinstance(review.analysis, dict):
+            review.analysis = ReviewAnalysis.from_dict(review.analysis, review.text)
+        if review.processed_at is not MISSING:
+            review.processed_at = _encode_timestamp(review.processed_at)
+        review.extra = data or None
+        return review
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if value is MISSING:
+                continue
+            if field == 'analysis' and isinstance(value, ReviewAnalysis):
+                value = value.to_dict()
+            elif field == 'images' and value == ():
+                value = []
+            elif field == 'processed_at':
+                value = _decode_timestamp(value)
+            result[field] = value
+        if self.extra:
+            result.update(self.extra)
+        return result
+
+
+class AnalyzedReviewList(Sequence):
+    """Read-only list of analyzed reviews stored as compact records
+
+    Indexing and iteration hand out plain dicts in the analysis_results.json
+    schema, built on demand, so existing dict-based consumers work unchanged.
+    """
+
+    def __init__(self, records: Iterable[AnalyzedReview] = ()):
+        self._records = list(records)
+
+    @classmethod
+    def from_dicts(cls, reviews: Iterable[Dict[str, Any]]) -> 'AnalyzedReviewList':
+        return cls(AnalyzedReview.from_dict(r) for r in reviews)
+
+    def append(self, review: Dict[str, Any]):
+        self._records.append(AnalyzedReview.from_dict(review))
+
+    def records(self) -> List[AnalyzedReview]:
+        return self._records
+
+    def __len__(self):
+        return len(self._records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [r.to_dict() for r in self._records[index]]
+        return self._records[index].to_dict()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for record in self._records:
+            yield record.to_dict()
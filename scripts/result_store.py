@@ -0,0 +1,374 @@
+import hashlib
+import json
+import sqlite3
+import argparse
+from typing import List, Dict, Any, Optional, Iterable
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    review_id TEXT PRIMARY KEY,
+    author TEXT,
+    rating REAL,
+    text TEXT,
+    date TEXT,
+    images TEXT,
+    local_guide INTEGER,
+    analysis_model TEXT,
+    processed_at TEXT,
+    error TEXT,
+    content_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS analyses (
+    review_id TEXT PRIMARY KEY REFERENCES reviews(review_id) ON DELETE CASCADE,
+    sentiment TEXT,
+    confidence REAL,
+    sentiment_score REAL,
+    severity INTEGER,
+    summary TEXT
+);
+CREATE TABLE IF NOT EXISTS dimensions (
+    review_id TEXT REFERENCES reviews(review_id) ON DELETE CASCADE,
+    position INTEGER,
+    name TEXT,
+    sentiment TEXT,
+    PRIMARY KEY (review_id, position)
+);
+CREATE TABLE IF NOT EXISTS key_points (
+    review_id TEXT REFERENCES reviews(review_id) ON DELETE CASCADE,
+    position INTEGER,
+    dimension TEXT,
+    point TEXT
+);
+CREATE TABLE IF NOT EXISTS themes (
+    review_id TEXT REFERENCES reviews(review_id) ON DELETE CASCADE,
+    theme TEXT
+);
+CREATE TABLE IF NOT EXISTS run_metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_reviews_date ON reviews(date);
+CREATE INDEX IF NOT EXISTS idx_reviews_rating ON reviews(rating);
+CREATE INDEX IF NOT EXISTS idx_analyses_sentiment_severity ON analyses(sentiment, severity);
+CREATE INDEX IF NOT EXISTS idx_dimensions_name_sentiment ON dimensions(name, sentiment);
+CREATE INDEX IF NOT EXISTS idx_dimensions_review ON dimensions(review_id);
+CREATE INDEX IF NOT EXISTS idx_key_points_review ON key_points(review_id);
+CREATE INDEX IF NOT EXISTS idx_themes_theme ON themes(theme);
+CREATE INDEX IF NOT EXISTS idx_themes_review ON themes(review_id);
+-- FTS rows share the rowid of their reviews row, so they are replaced by rowid
+CREATE VIRTUAL TABLE IF NOT EXISTS review_fts USING fts5(
+    review_id UNINDEXED,
+    text,
+    key_points,
+    tokenize = 'unicode61'
+);
+"""
+
+# Top-level output sections kept alongside the per-review tables
+METADATA_SECTIONS = ["metadata", "summary_statistics", "sentiment_summaries", "dimension_summaries"]
+
+# PRAGMA user_version of the current layout (1: review_fts keyed by reviews.rowid)
+SCHEMA_VERSION = 1
+
+
+class ResultStore:
+    """SQLite store for analyzed reviews with indexed and full-text queries
+
+    All writes are upserts keyed by review_id. Each review's content hash is
+    stored, so re-importing an overlapping set of reviews skips the unchanged
+    ones and only rewrites (with their child rows) those that changed.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+        self._add_missing_columns()
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._rebuild_fts()
+
+    def _add_missing_columns(self):
+        """Bring databases created by older versions up to the current reviews schema"""
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(reviews)")}
+        if 'local_guide' not in columns:
+            self.conn.execute("ALTER TABLE reviews ADD COLUMN local_guide INTEGER")
+        if 'content_hash' not in columns:
+            self.conn.execute("ALTER TABLE reviews ADD COLUMN content_hash TEXT")
+
+    def _rebuild_fts(self):
+        """Re-key every full-text row by its reviews rowid (older databases used free rowids)"""
+        with self.conn:
+            self.conn.execute("DELETE FROM review_fts")
+            for row in self.conn.execute("SELECT rowid, review_id, text FROM reviews").fetchall():
+                points = [p['point'] for p in self.conn.execute(
+                    "SELECT point FROM key_points WHERE review_id = ? ORDER BY position, rowid", (row['review_id'],))]
+                self.conn.execute("INSERT INTO review_fts (rowid, review_id, text, key_points) VALUES (?, ?, ?, ?)",
+                                  (row['rowid'], row['review_id'], row['text'] or '', "\n".join(points)))
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _upsert_review(self, review: Dict[str, Any]) -> bool:
+        """Write one review and its child rows; False (nothing written) if it is unchanged"""
+        review_id = review.get('review_id')
+        analysis = review.get('analysis', {}) or {}
+        cur = self.conn
+
+        content_hash = hashlib.sha256(
+            json.dumps(review, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        existing = cur.execute("SELECT rowid, content_hash FROM reviews WHERE review_id = ?", (review_id,)).fetchone()
+        if existing is not None and existing['content_hash'] == content_hash:
+            return False
+
+        inserted = cur.execute("""
+            INSERT INTO reviews (review_id, author, rating, text, date, images, local_guide,
+                                 analysis_model, processed_at, error, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(review_id) DO UPDATE SET
+                author = excluded.author, rating = excluded.rating, text = excluded.text,
+                date = excluded.date, images = excluded.images, local_guide = excluded.local_guide,
+                analysis_model = excluded.analysis_model,
+                processed_at = excluded.processed_at, error = excluded.error,
+                content_hash = excluded.content_hash
+        """, (
+            review_id, review.get('author', ''), review.get('rating'), review.get('text', ''),
+            review.get('date', ''), json.dumps(review.get('images', []), ensure_ascii=False),
+            None if review.get('local_guide') is None else int(bool(review['local_guide'])),
+            review.get('analysis_model'), review.get('processed_at'), review.get('error'), content_hash
+        ))
+        rowid = existing['rowid'] if existing is not None else inserted.lastrowid
+
+        cur.execute("""
+            INSERT INTO analyses (review_id, sentiment, confidence, sentiment_score, severity, summary)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(review_id) DO UPDATE SET
+                sentiment = excluded.sentiment, confidence = excluded.confidence,
+                sentiment_score = excluded.sentiment_score, severity = excluded.severity,
+                summary = excluded.summary
+        """, (
+            review_id, analysis.get('sentiment'), _as_number(analysis.get('confidence')),
+            _as_number(analysis.get('sentiment_score')), _as_number(analysis.get('severity')),
+            analysis.get('summary', '')
+        ))
+
+        # Child rows are replaced wholesale for the review
+        for table in ("dimensions", "key_points", "themes"):
+            cur.execute(f"DELETE FROM {table} WHERE review_id = ?", (review_id,))
+        cur.execute("DELETE FROM review_fts WHERE rowid = ?", (rowid,))
+
+        all_points = []
+        for position, dim in enumerate(analysis.get('dimensions', []) or []):
+            name = dim.get('name', '')
+            cur.execute("INSERT INTO dimensions (review_id, position, name, sentiment) VALUES (?, ?, ?, ?)",
+                        (review_id, position, name, dim.get('sentiment')))
+            points = [p for p in dim.get('key_points', []) or [] if isinstance(p, str)]
+            cur.executemany("INSERT INTO key_points (review_id, position, dimension, point) VALUES (?, ?, ?, ?)",
+                            [(review_id, position, name, p) for p in points])
+            all_points.extend(points)
+
+        themes = [t for t in analysis.get('key_themes', []) or [] if isinstance(t, str)]
+        cur.executemany("INSERT INTO themes (review_id, theme) VALUES (?, ?)",
+                        [(review_id, t) for t in themes])
+
+        cur.execute("INSERT INTO review_fts (rowid, review_id, text, key_points) VALUES (?, ?, ?, ?)",
+                    (rowid, review_id, review.get('text', '') or '', "\n".join(all_points)))
+        return True
+
+    def upsert_reviews(self, analyzed_reviews: Iterable[Dict[str, Any]]) -> int:
+        """Insert or update analyzed reviews in a single transaction; returns how many were written"""
+        count = 0
+        with self.conn:
+            for review in analyzed_reviews:
+                if not review.get('review_id'):
+                    continue
+                if self._upsert_review(review):
+                    count += 1
+        return count
+
+    def save_results(self, results: Dict[str, Any]) -> int:
+        """Store a full analysis results document (reviews plus summary sections)
+
+        Returns the number of new or changed reviews written.
+        """
+        count = self.upsert_reviews(results.get('analyzed_reviews', []))
+        with self.conn:
+            for section in METADATA_SECTIONS:
+                if section in results:
+                    self.conn.execute(
+                        "INSERT INTO run_metadata (key, value) VALUES (?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                        (section, json.dumps(results[section], ensure_ascii=False))
+                    )
+        return count
+
+    def get_section(self, key: str) -> Optional[Any]:
+        """Return a stored top-level section such as summary_statistics"""
+        row = self.conn.execute("SELECT value FROM run_metadata WHERE key = ?", (key,)).fetchone()
+        return json.loads(row['value']) if row else None
+
+    def query(self, date_from: Optional[str] = None, date_to: Optional[str] = None,
+              sentiment: Optional[str] = None, dimension: Optional[str] = None,
+              dimension_sentiment: Optional[str] = None, min_severity: Optional[int] = None,
+              search: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Filter reviews using the indexes (and FTS for text search)
+
+        Dates are compared as ISO strings, so a plain YYYY-MM-DD bound works;
+        date_to is inclusive of the whole day.
+        """
+        clauses = []
+        params: List[Any] = []
+
+        if date_from:
+            clauses.append("r.date >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("r.date <= ?")
+            params.append(date_to + "T99" if len(date_to) == 10 else date_to)
+        if sentiment:
+            clauses.append("a.sentiment = ?")
+            params.append(sentiment)
+        if min_severity is not None:
+            clauses.append("a.severity >= ?")
+            params.append(min_severity)
+        if dimension or dimension_sentiment:
+            sub = "SELECT review_id FROM dimensions WHERE 1 = 1"
+            if dimension:
+                sub += " AND name = ?"
+                params.append(dimension)
+            if dimension_sentiment:
+                sub += " AND sentiment = ?"
+                params.append(dimension_sentiment)
+            clauses.append(f"r.review_id IN ({sub})")
+        if search:
+            clauses.append("r.rowid IN (SELECT rowid FROM review_fts WHERE review_fts MATCH ?)")
+            params.append(search)
+
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        sql = f"""
+            SELECT r.*, a.sentiment, a.confidence, a.sentiment_score, a.severity, a.summary
+            FROM reviews r JOIN analyses a ON a.review_id = r.review_id
+            {where}
+            ORDER BY r.date DESC
+            LIMIT ? OFFSET ?
+        """
+        rows = self.conn.execute(sql, params + [limit, offset]).fetchall()
+        return [self._to_review(row) for row in rows]
+
+    def _to_review(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """Rebuild a review in the analysis_results.json shape"""
+        review_id = row['review_id']
+        dimensions = []
+        for dim in self.conn.execute(
+                "SELECT position, name, sentiment FROM dimensions WHERE review_id = ? ORDER BY position",
+                (review_id,)):
+            points = [p['point'] for p in self.conn.execute(
+                "SELECT point FROM key_points WHERE review_id = ? AND position = ? ORDER BY rowid",
+                (review_id, dim['position']))]
+            dimensions.append({"name": dim['name'], "sentiment": dim['sentiment'], "key_points": points})
+        themes = [t['theme'] for t in self.conn.execute(
+            "SELECT theme FROM themes WHERE review_id = ? ORDER BY rowid", (review_id,))]
+
+        review = {
+            "review_id": review_id,
+            "author": row['author'],
+            "rating": row['rating'],
+            "text": row['text'],
+            "date": row['date'],
+            "images": json.loads(row['images'] or '[]'),
+        }
+        if row['local_guide'] is not None:
+            review["local_guide"] = bool(row['local_guide'])
+        review.update({
+            "analysis": {
+                "sentiment": row['sentiment'],
+                "confidence": row['confidence'],
+                "sentiment_score": row['sentiment_score'],
+                "dimensions": dimensions,
+                "key_themes": themes,
+                "severity": row['severity'],
+                "summary": row['summary']
+            },
+            "processed_at": row['processed_at']
+        })
+        if row['analysis_model']:
+            review["analysis_model"] = row['analysis_model']
+        if row['error']:
+            review["error"] = row['error']
+        return review
+
+
+def _as_number(value: Any) -> Optional[float]:
+    """Coerce model-provided numbers (sometimes strings or empty) for numeric columns"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite store for sentiment analysis results')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='Upsert an analysis results JSON file into the database')
+    import_parser.add_argument('results_file', help='Path to analysis results JSON file')
+    import_parser.add_argument('db', help='Path to SQLite database')
+
+    query_parser = subparsers.add_parser('query', help='Query analyzed reviews')
+    query_parser.add_argument('db', help='Path to SQLite database')
+    query_parser.add_argument('--from', dest='date_from', help='Earliest review date (YYYY-MM-DD or ISO timestamp)')
+    query_parser.add_argument('--to', dest='date_to', help='Latest review date (inclusive)')
+    query_parser.add_argument('--sentiment', choices=['positive', 'negative', 'neutral', 'doubtful'])
+    query_parser.add_argument('--dimension', help='Only reviews mentioning this dimension, e.g. "Service Quality"')
+    query_parser.add_argument('--dimension-sentiment', choices=['positive', 'negative', 'neutral'],
+                              help='Sentiment of the dimension mention')
+    query_parser.add_argument('--min-severity', type=int, help='Minimum severity')
+    query_parser.add_argument('--search', help='Full-text search over review text and key points (FTS5 syntax)')
+    query_parser.add_argument('--limit', type=int, default=50)
+    query_parser.add_argument('--offset', type=int, default=0)
+    query_parser.add_argument('--json', action='store_true', help='Print full records as JSON')
+
+    args = parser.parse_args()
+
+    with ResultStore(args.db) as store:
+        if args.command == 'import':
+            with open(args.results_file, 'r', encoding='utf-8') as f:
+                results = json.load(f)
+            count = store.save_results(results)
+            print(f"Upserted {count} new or changed reviews into {args.db}")
+            return
+
+        try:
+            reviews = store.query(date_from=args.date_from, date_to=args.date_to, sentiment=args.sentiment,
+                                  dimension=args.dimension, dimension_sentiment=args.dimension_sentiment,
+                                  min_severity=args.min_severity, search=args.search,
+                                  limit=args.limit, offset=args.offset)
+        except sqlite3.OperationalError as e:
+            if not args.search:
+                raise
+            # FTS5 rejects malformed MATCH expressions (e.g. an unbalanced quote)
+            print(f"Error: invalid search expression {args.search!r}: {e}")
+            return
+        if args.json:
+            print(json.dumps(reviews, ensure_ascii=False, indent=2))
+            return
+        for review in reviews:
+            analysis = review['analysis']
+            text = (review['text'] or '').replace('\n', ' ')
+            print(f"{(review['date'] or '')[:10]}  {analysis['sentiment']:<9} sev={analysis['severity'] or 0:<3g} "
+                  f"rating={review['rating'] or 0:g}  {review['review_id']}  {text[:80]}")
+        print(f"{len(reviews)} reviews")
+
+
+if __name__ == "__main__":
+    main()
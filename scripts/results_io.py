@@ -0,0 +1,403 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+from array import array
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _StreamingJsonReader:
+    """Incremental reader over a large JSON document
+
+    Values are decoded one at a time with JSONDecoder.raw_decode on a sliding
+    buffer, so a results file with hundreds of thousands of reviews can be
+    walked without ever holding the whole document in memory.
+    """
+
+    def __init__(self, f, chunk_size: int = 1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """Append more data to the buffer, dropping what was already consumed"""
+        if self.eof:
+            return False
+        # Grow reads with the pending value so a large value is not re-parsed too often
+        chunk = self.f.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos] if self.pos < len(self.buf) else ''
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Invalid results file: expected {char!r}, found {found!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may have been cut in half
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+    def iter_array(self) -> Iterator[Any]:
+        """Yield the elements of the JSON array at the current position"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f"Invalid results file: unexpected {separator!r} in array")
+
+
+def iter_results_file(file_path: str) -> Iterator[Tuple[str, Any]]:
+    """Stream the top-level (key, value) pairs of an analysis results file
+
+    The value for "analyzed_reviews" is an iterator over the reviews; if the
+    caller does not consume it, it is skipped before the next key is read.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        reader = _StreamingJsonReader(f)
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+        while True:
+            key = reader.value()
+            reader.expect(':')
+            if key == 'analyzed_reviews':
+                reviews = reader.iter_array()
+                yield key, reviews
+                for _ in reviews:
+                    pass
+            else:
+                yield key, reader.value()
+            separator = reader.peek()
+            reader.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Invalid results file: unexpected {separator!r} after {key!r}")
+
+
+def iter_analyzed_reviews(file_path: str) -> Iterator[Dict[str, Any]]:
+    """Stream analyzed reviews from a results JSON file or a JSONL file"""
+    if file_path.endswith('.jsonl'):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    for key, value in iter_results_file(file_path):
+        if key == 'analyzed_reviews':
+            yield from value
+
+
+def read_results_sections(file_path: str) -> Dict[str, Any]:
+    """Read every top-level section except the analyzed reviews"""
+    if file_path.endswith('.jsonl'):
+        return {}
+    return {key: value for key, value in iter_results_file(file_path) if key != 'analyzed_reviews'}
+
+
+def review_index_path(results_path: str) -> str:
+    """Sidecar index file written next to a results file"""
+    return results_path + '.idx'
+
+
+# Index layout: header, then a power-of-two open-addressing hash table of
+# (key hash, byte offset, byte length) slots; key hash 0 marks an empty slot.
+_INDEX_MAGIC = b'RVIDX001'
+_INDEX_HEADER = struct.Struct('<8sQQQ')  # magic, records, slots, results file size
+_INDEX_SLOT = struct.Struct('<QQQ')
+
+
+def _review_key_hash(review_id: Any) -> int:
+    key = review_id if isinstance(review_id, str) else json.dumps(review_id)
+    digest = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+    return digest or 1
+
+
+class _ReviewIndexBuilder:
+    """Collect review byte ranges while a results file is written, then save the sidecar table"""
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self.hashes = array('Q')
+        self.offsets = array('Q')
+        self.lengths = array('Q')
+
+    def add(self, review_id: Any, offset: int, length: int):
+        self.hashes.append(_review_key_hash(review_id))
+        self.offsets.append(offset)
+        self.lengths.append(length)
+
+    def write(self, results_size: int):
+        # At most half full, so a lookup probes about 1.5 slots on average
+        slots = 8
+        while slots < 2 * len(self.hashes):
+            slots *= 2
+        mask = slots - 1
+        table = bytearray(_INDEX_HEADER.size + slots * _INDEX_SLOT.size)
+        _INDEX_HEADER.pack_into(table, 0, _INDEX_MAGIC, len(self.hashes), slots, results_size)
+        occupied = bytearray(slots)
+
+        # Duplicate review_ids all get a slot; readers prefer the last one written
+        for key_hash, offset, length in zip(self.hashes, self.offsets, self.lengths):
+            slot = key_hash & mask
+            while occupied[slot]:
+                slot = (slot + 1) & mask
+            occupied[slot] = 1
+            _INDEX_SLOT.pack_into(table, _INDEX_HEADER.size + slot * _INDEX_SLOT.size, key_hash, offset, length)
+
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(table)
+        os.replace(tmp_path, self.index_path)
+
+
+class ResultsFileWriter:
+    """Write an analysis results file section by section
+
+    The output matches json.dump(results, indent=2) for the same content, but
+    reviews are written one at a time so they never have to be held in memory.
+    Sections must be written before the first review. With index_path, the
+    byte range of every review is recorded in a sidecar index for
+    IndexedResults.
+    """
+
+    def __init__(self, file_path: str, indent: int = 2, index_path: Optional[str] = None):
+        self.file_path = file_path
+        self.indent = indent
+        # No newline translation, so the byte offsets recorded for the index are exact
+        self.f = open(file_path, 'w', encoding='utf-8', newline='')
+        self._offset = 0
+        self._index = _ReviewIndexBuilder(index_path) if index_path else None
+        self._write('{')
+        self._has_keys = False
+        self._in_reviews = False
+        self._review_count = 0
+
+    def _write(self, text: str) -> int:
+        """Write text, returning its length in bytes (only counted when indexing)"""
+        self.f.write(text)
+        if self._index is None:
+            return 0
+        size = len(text.encode('utf-8'))
+        self._offset += size
+        return size
+
+    def _dumps(self, value: Any, depth: int) -> str:
+        text = json.dumps(value, ensure_ascii=False, indent=self.indent)
+        if self.indent is None:
+            return text
+        return text.replace('\n', '\n' + ' ' * (self.indent * depth))
+
+    def _newline(self, depth: int) -> str:
+        return '' if self.indent is None else '\n' + ' ' * (self.indent * depth)
+
+    def _separator(self) -> str:
+        return ', ' if self.indent is None else ','
+
+    def write_section(self, key: str, value: Any):
+        if self._in_reviews:
+            raise ValueError("Sections must be written before analyzed reviews")
+        if self._has_keys:
+            self._write(self._separator())
+        self._write(f"{self._newline(1)}{json.dumps(key)}: {self._dumps(value, 1)}")
+        self._has_keys = True
+
+    def write_review(self, review: Dict[str, Any]):
+        if not self._in_reviews:
+            if self._has_keys:
+                self._write(self._separator())
+            self._write(f'{self._newline(1)}"analyzed_reviews": [')
+            self._has_keys = True
+            self._in_reviews = True
+        elif self._review_count:
+            self._write(self._separator())
+        self._write(self._newline(2))
+        offset = self._offset
+        length = self._write(self._dumps(review, 2))
+        if self._index is not None:
+            self._index.add(review.get('review_id'), offset, length)
+        self._review_count += 1
+
+    def close(self):
+        if self.f.closed:
+            return
+        if not self._in_reviews:
+            self.write_section('analyzed_reviews', [])
+        else:
+            self._write((self._newline(1) if self._review_count else '') + ']')
+        self._write(self._newline(0) + '}')
+        self.f.close()
+        if self._index is not None:
+            self._index.write(self._offset)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonlResultsWriter:
+    """Write analyzed reviews one JSON object per line, optionally with a sidecar index"""
+
+    def __init__(self, file_path: str, index_path: Optional[str] = None):
+        self.file_path = file_path
+        self.f = open(file_path, 'wb')
+        self._offset = 0
+        self._index = _ReviewIndexBuilder(index_path) if index_path else None
+
+    def write_review(self, review: Dict[str, Any]):
+        data = json.dumps(review, ensure_ascii=False).encode('utf-8')
+        self.f.write(data + b'\n')
+        if self._index is not None:
+            self._index.add(review.get('review_id'), self._offset, len(data))
+        self._offset += len(data) + 1
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.f.close()
+        if self._index is not None:
+            self._index.write(self._offset)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class IndexedResults:
+    """Random access to the reviews of a results file (.json or .jsonl) through its sidecar index
+
+    Both files are memory-mapped; a lookup hashes the review_id, probes the
+    index table and decodes only the bytes of the matching review, so its cost
+    does not depend on the size of the file.
+    """
+
+    def __init__(self, results_path: str, index_path: Optional[str] = None):
+        self.results_path = results_path
+        self.index_path = index_path or review_index_path(results_path)
+        if not os.path.exists(self.index_path):
+            raise FileNotFoundError(f"No review index for {results_path}; re-export it with "
+                                    f"'main.py export' to create {self.index_path}")
+
+        with open(self.index_path, 'rb') as f:
+            self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._records, self._slots, results_size = _INDEX_HEADER.unpack_from(self._index, 0)
+        if magic != _INDEX_MAGIC:
+            self._index.close()
+            raise ValueError(f"Not a review index: {self.index_path}")
+
+        with open(results_path, 'rb') as f:
+            actual_size = os.fstat(f.fileno()).st_size
+            if actual_size != results_size:
+                self._index.close()
+                raise ValueError(f"Review index {self.index_path} is stale: it was built for a "
+                                 f"{results_size}-byte file, {results_path} has {actual_size} bytes")
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if actual_size else b''
+
+    def close(self):
+        self._index.close()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._records
+
+    def _candidates(self, review_id: Any) -> List[Tuple[int, int]]:
+        """(offset, length) of every slot whose key hash matches, last written first"""
+        key_hash = _review_key_hash(review_id)
+        mask = self._slots - 1
+        slot = key_hash & mask
+        found = []
+        while True:
+            slot_hash, offset, length = _INDEX_SLOT.unpack_from(self._index, _INDEX_HEADER.size + slot * _INDEX_SLOT.size)
+            if slot_hash == 0:
+                break
+            if slot_hash == key_hash:
+                found.append((offset, length))
+            slot = (slot + 1) & mask
+        found.sort(reverse=True)
+        return found
+
+    def _read(self, offset: int, length: int) -> Dict[str, Any]:
+        return json.loads(self._data[offset:offset + length].decode('utf-8'))
+
+    def _lookup(self, review_id: Any) -> Optional[Dict[str, Any]]:
+        # The stored review_id is checked, so a hash collision can never return the wrong review
+        for offset, length in self._candidates(review_id):
+            review = self._read(offset, length)
+            if review.get('review_id') == review_id:
+                return review
+        return None
+
+    def __contains__(self, review_id: Any) -> bool:
+        return self._lookup(review_id) is not None
+
+    def get(self, review_id: Any) -> Dict[str, Any]:
+        """The analyzed review with this review_id; KeyError if it is not in the file"""
+        review = self._lookup(review_id)
+        if review is None:
+            raise KeyError(review_id)
+        return review
+
+    def get_many(self, review_ids: Iterable[Any]) -> List[Optional[Dict[str, Any]]]:
+        """Reviews for a batch of ids (None where missing), read in file order"""
+        review_ids = list(review_ids)
+        located = sorted(((c, i) for i, review_id in enumerate(review_ids)
+                          for c in self._candidates(review_id)[:1]))
+        results: List[Optional[Dict[str, Any]]] = [None] * len(review_ids)
+        for (offset, length), i in located:
+            review = self._read(offset, length)
+            if review.get('review_id') == review_ids[i]:
+                results[i] = review
+            else:
+                results[i] = self._lookup(review_ids[i])
+        return results
@@ -0,0 +1,85 @@
+import copy
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, Optional
+
+
+def summary_fingerprint(**inputs: Any) -> str:
+    """Stable hash of the inputs that determine a summary prompt's answer
+
+    Callers pass key point lists through multiset_key so the fingerprint depends
+    on the multiset of points, not on the order reviews happened to be processed in.
+    """
+    payload = json.dumps(inputs, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def multiset_key(values: Iterable[Any]) -> List[str]:
+    """Order-independent fingerprint form of a list of model-provided values
+
+    Each value is JSON-encoded first, so numbers, nulls or nested values mixed
+    in with strings sort without errors and stay distinct from their string forms.
+    """
+    return sorted(json.dumps(v, ensure_ascii=False, sort_keys=True, default=str) for v in values)
+
+
+class SummaryCache:
+    """Bounded LRU cache of generated summaries keyed by input fingerprint
+
+    With a path the cache is loaded on creation and written back by save(), so
+    an unchanged dataset reproduces its summaries without any API calls.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 256):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries.update(json.load(f).get('entries', []))
+            self._evict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached summary (marking it recently used), or None"""
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return copy.deepcopy(self.entries[key])
+
+    def put(self, key: str, summary: Dict[str, Any]):
+        self.entries[key] = copy.deepcopy(summary)
+        self.entries.move_to_end(key)
+        self._evict()
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            # Stored least recently used first, so reloading keeps the LRU order
+            json.dump({"entries": list(self.entries.items())}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries
+        }
@@ -0,0 +1,296 @@
+import json
+import os
+import re
+import unicodedata
+import zlib
+from typing import List, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+
+# Arabic diacritics/tatweel and letter variants folded before vectorizing
+_ARABIC_MARKS = re.compile(r'[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]')
+_ARABIC_FOLDS = str.maketrans({'\u0623': '\u0627', '\u0625': '\u0627', '\u0622': '\u0627', '\u0629': '\u0647',
+                               '\u0649': '\u064A', '\u0624': '\u0648', '\u0626': '\u064A'})
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+def normalize_theme(text: str) -> str:
+    """Case-, punctuation- and Arabic-variant-insensitive key for a theme string"""
+    text = unicodedata.normalize('NFKC', text).lower()
+    text = _ARABIC_MARKS.sub('', text).translate(_ARABIC_FOLDS)
+    return ' '.join(_NON_WORD.sub(' ', text).split())
+
+
+# Words that flip a theme's polarity; themes only merge with the same polarity
+# so "Poor service quality" never folds into "Good service quality". Arabic
+# words are folded like the themes, and matched with or without a clitic prefix
+_NEGATIVE_WORDS = {normalize_theme(w) for w in [
+    'poor', 'bad', 'lack', 'no', 'not', 'rude', 'long', 'dirty', 'unprofessional', 'slow', 'negative',
+    'delay', 'delays', 'delayed', 'unclean', 'disrespectful', 'inefficient', 'ineffective', 'unhelpful',
+    'worst', 'terrible', 'insufficient', 'low', 'inadequate', 'issue', 'issues', 'problem', 'problems',
+    'without', 'never', 'missing', 'unavailable',
+    'سوء', 'سيء', 'سيئ', 'سيئة', 'عدم', 'انعدام', 'لا', 'لم', 'لن', 'ليس', 'غير', 'بدون', 'قلة', 'نقص',
+    'ضعف', 'ضعيف', 'ضعيفة', 'بطء', 'بطيء', 'تأخير', 'تأخر', 'إهمال', 'رديء', 'رديئة', 'وقح', 'مشكلة', 'مشاكل'
+]}
+_POSITIVE_WORDS = {normalize_theme(w) for w in [
+    'good', 'great', 'excellent', 'positive', 'friendly', 'clean', 'helpful', 'efficient', 'effective',
+    'professional', 'best', 'quick', 'fast', 'caring', 'kind', 'high',
+    'حسن', 'جيد', 'جيدة', 'ممتاز', 'ممتازة', 'رائع', 'رائعة', 'نظيف', 'نظيفة', 'سريع', 'سريعة',
+    'لطيف', 'لطيفة', 'احترافي', 'احترافية', 'أفضل', 'مميز', 'مميزة', 'متميز', 'متميزة'
+]}
+_ARABIC_PREFIXES = ('وال', 'بال', 'فال', 'كال', 'لل', 'ال', 'و', 'ب', 'ف', 'ل')
+
+# Opposite-meaning themes that must never share a canonical id (see `check`)
+POLARITY_PAIRS = [
+    ("حسن المعاملة", "سوء المعاملة"),
+    ("Low quality services", "High quality service"),
+    ("Good service quality", "Poor service quality"),
+    ("نظافة المكان", "عدم نظافة المكان"),
+    ("Adequate staffing", "Inadequate staffing"),
+    ("Billing", "Billing issues"),
+]
+
+
+def theme_polarity(key: str) -> int:
+    """-1, 0 or 1 from the polarity words in a normalized theme"""
+    words = set(key.split())
+    for word in list(words):
+        for prefix in _ARABIC_PREFIXES:
+            if word.startswith(prefix) and len(word) - len(prefix) >= 2:
+                words.add(word[len(prefix):])
+    if words & _NEGATIVE_WORDS:
+        return -1
+    return 1 if words & _POSITIVE_WORDS else 0
+
+
+def _alias_key(key: str, sentiment: Optional[str]) -> str:
+    """Alias of a normalized string; strings seen under a sentiment get their own alias"""
+    return f"{sentiment}|{key}" if key and sentiment else key
+
+
+class ThemeIndex:
+    """Persistent index mapping free-text themes and key points to canonical ids
+
+    Strings are embedded as hashed character n-gram vectors (per word, so word
+    order does not matter) and matched to canonical centroids with batched
+    cosine similarity. Every normalized string ever seen is kept as an alias,
+    so repeat strings resolve with a dict lookup; only new strings touch the
+    centroid matrix, and the whole index is saved between runs. New strings
+    and centroids are compared in fixed-size blocks, so memory stays bounded
+    however many strings a run brings.
+
+    Strings only merge when they share a polarity (from theme_polarity) and the
+    sentiment they were expressed with, when the caller passes one, so praise
+    and complaints about the same topic keep separate canonical ids.
+    """
+
+    block_size = 1024       # new strings vectorized and clustered together
+    centroid_block = 4096   # centroids compared against a block at a time
+
+    def __init__(self, threshold: float = 0.7, dims: int = 2048, ngram: int = 3):
+        self.threshold = threshold
+        self.dims = dims
+        self.ngram = ngram
+        self.labels: List[str] = []          # canonical id -> display label
+        self.aliases: Dict[str, int] = {}    # normalized string (scoped by sentiment) -> canonical id
+        self.sentiments: List[Optional[str]] = []   # canonical id -> sentiment it was formed under
+        # canonical id -> merge group, a (sentiment, polarity) pair packed into an int
+        self._groups = np.zeros(0, dtype=np.int32)
+        self._scopes: Dict[Optional[str], int] = {None: 0}
+        # Un-normalized centroid sums (rows past len(labels) are spare capacity)
+        # and their norms; cosine similarity divides by the norm on the fly
+        self._sums = np.zeros((0, dims), dtype=np.float32)
+        self._norms = np.zeros(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _vectorize(self, texts: List[str]) -> np.ndarray:
+        """Unit-length hashed character n-gram vectors, one row per text"""
+        vectors = np.zeros((len(texts), self.dims), dtype=np.float32)
+        rows, cols = [], []
+        for row, text in enumerate(texts):
+            for word in text.split():
+                padded = f" {word} "
+                for i in range(max(1, len(padded) - self.ngram + 1)):
+                    rows.append(row)
+                    cols.append(zlib.crc32(padded[i:i + self.ngram].encode('utf-8')) % self.dims)
+        np.add.at(vectors, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), 1.0)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _group(self, key: str, sentiment: Optional[str]) -> int:
+        """Merge group of a normalized string seen under a sentiment"""
+        scope = self._scopes.setdefault(sentiment, len(self._scopes))
+        return scope * 3 + theme_polarity(key) + 1
+
+    def _grow(self, rows: int):
+        """Make room for at least rows centroids, growing by a quarter so appends stay cheap"""
+        if rows <= len(self._sums):
+            return
+        capacity = max(rows, len(self._sums) + len(self._sums) // 4, 64)
+        sums = np.zeros((capacity, self.dims), dtype=np.float32)
+        sums[:len(self._sums)] = self._sums
+        norms = np.zeros(capacity, dtype=np.float32)
+        norms[:len(self._norms)] = self._norms
+        self._sums, self._norms = sums, norms
+
+    def _best_matches(self, vectors: np.ndarray, groups: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Most similar same-group centroid (id, cosine) for each vector"""
+        best_ids = np.full(len(vectors), -1, dtype=np.intp)
+        best_sims = np.full(len(vectors), -np.inf, dtype=np.float32)
+        rows = np.arange(len(vectors))
+        for start in range(0, len(self.labels), self.centroid_block):
+            stop = min(start + self.centroid_block, len(self.labels))
+            sims = vectors @ self._sums[start:stop].T
+            sims /= np.maximum(self._norms[start:stop], 1e-12)
+            sims[groups[:, None] != self._groups[None, start:stop]] = -1.0
+            block_best = sims.argmax(axis=1)
+            block_sims = sims[rows, block_best]
+            better = block_sims > best_sims
+            best_ids[better] = block_best[better] + start
+            best_sims[better] = block_sims[better]
+        return best_ids, best_sims
+
+    def _assign_block(self, new_aliases: List[str], pending: Dict[str, Tuple[str, str, Optional[str]]]):
+        """Assign one block of new aliases, creating canonical ids as needed"""
+        vectors = self._vectorize([pending[alias][1] for alias in new_aliases])
+        groups = np.array([self._group(key, sentiment) for _, key, sentiment in map(pending.get, new_aliases)],
+                          dtype=np.int32)
+        assigned = np.full(len(new_aliases), -1, dtype=np.intp)
+
+        # Cosine similarity against the existing centroids
+        if len(self.labels):
+            best, sims = self._best_matches(vectors, groups)
+            matched = sims >= self.threshold
+            assigned[matched] = best[matched]
+
+        # Leader clustering of what is left, against each other
+        unmatched = np.flatnonzero(assigned < 0)
+        if len(unmatched):
+            sims = vectors[unmatched] @ vectors[unmatched].T
+            sims[groups[unmatched][:, None] != groups[unmatched][None, :]] = -1.0
+            first_new_id = len(self.labels)
+            for pos, idx in enumerate(unmatched):
+                if assigned[idx] >= 0:
+                    continue
+                members = unmatched[(sims[pos] >= self.threshold) & (assigned[unmatched] < 0)]
+                assigned[members] = len(self.labels)
+                text, _, sentiment = pending[new_aliases[idx]]
+                self.labels.append(text)
+                self.sentiments.append(sentiment)
+            new_leaders = [np.flatnonzero(assigned == i)[0] for i in range(first_new_id, len(self.labels))]
+            self._groups = np.concatenate([self._groups, groups[new_leaders]])
+            self._grow(len(self.labels))
+
+        np.add.at(self._sums, assigned, vectors)
+        touched = np.unique(assigned)
+        self._norms[touched] = np.linalg.norm(self._sums[touched], axis=1)
+        for alias, canonical_id in zip(new_aliases, assigned.tolist()):
+            self.aliases[alias] = canonical_id
+
+    def assign(self, texts: Iterable[str], sentiments: Optional[Iterable[Optional[str]]] = None
+               ) -> List[Optional[int]]:
+        """Canonical id for each text (None for empty strings), creating new ids as needed
+
+        sentiments, if given, holds the sentiment each text was expressed with
+        (e.g. its review's or dimension mention's); texts only merge within one.
+        """
+        texts = list(texts)
+        scopes = [None] * len(texts) if sentiments is None else \
+            [s if isinstance(s, str) and s else None for s in sentiments]
+        keys = [normalize_theme(t) if isinstance(t, str) else '' for t in texts]
+        aliases = [_alias_key(key, scope) for key, scope in zip(keys, scopes)]
+
+        # Distinct new aliases, in first-seen order
+        pending: Dict[str, Tuple[str, str, Optional[str]]] = {}
+        for text, key, scope, alias in zip(texts, keys, scopes, aliases):
+            if alias and alias not in self.aliases and alias not in pending:
+                pending[alias] = (text, key, scope)
+
+        new_aliases = list(pending)
+        for start in range(0, len(new_aliases), self.block_size):
+            self._assign_block(new_aliases[start:start + self.block_size], pending)
+
+        return [self.aliases[alias] if alias else None for alias in aliases]
+
+    def canonical_counts(self, counts: Dict[Tuple[str, Optional[str]], int]) -> List[Tuple[str, int]]:
+        """Fold raw (string, sentiment) counts into canonical (label, count) pairs, most common first
+
+        Canonical ids formed under different sentiments whose labels normalize
+        the same are reported as one entry, under the first label seen.
+        """
+        raw = list(counts)
+        totals: Dict[str, List] = {}
+        for pair, canonical_id in zip(raw, self.assign([text for text, _ in raw], [s for _, s in raw])):
+            if canonical_id is not None:
+                label = self.labels[canonical_id]
+                total = totals.setdefault(normalize_theme(label), [label, 0])
+                total[1] += counts[pair]
+        return sorted((tuple(total) for total in totals.values()), key=lambda x: x[1], reverse=True)
+
+    def save(self, path: str):
+        """Write the index as <path> (JSON) plus <path>.npy (centroid sums)"""
+        meta = {
+            "threshold": self.threshold,
+            "dims": self.dims,
+            "ngram": self.ngram,
+            "labels": self.labels,
+            "sentiments": self.sentiments,
+            "aliases": self.aliases
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        with open(path + '.npy.tmp', 'wb') as f:
+            np.save(f, self._sums[:len(self.labels)])
+        os.replace(path + '.npy.tmp', path + '.npy')
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, threshold: Optional[float] = None) -> 'ThemeIndex':
+        """Load an index saved with save(), or start an empty one if it does not exist"""
+        if not os.path.exists(path):
+            return cls(threshold=threshold if threshold is not None else 0.7)
+        with open(path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        index = cls(threshold=threshold if threshold is not None else meta['threshold'],
+                    dims=meta['dims'], ngram=meta['ngram'])
+        index.labels = meta['labels']
+        index.aliases = meta['aliases']
+        index._sums = np.load(path + '.npy').astype(np.float32)
+        index._norms = np.linalg.norm(index._sums, axis=1).astype(np.float32)
+        # Indexes saved before sentiment scoping formed every id without one
+        index.sentiments = meta.get('sentiments', [None] * len(index.labels))
+        index._groups = np.array([index._group(normalize_theme(label), sentiment)
+                                  for label, sentiment in zip(index.labels, index.sentiments)], dtype=np.int32)
+        return index
+
+
+def main():
+    """Command line entry point: regression check of the polarity guard"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Theme index maintenance')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    check_parser = subparsers.add_parser('check', help='Verify that opposite-meaning themes never merge')
+    check_parser.add_argument('--threshold', type=float, default=0.7,
+                              help='Similarity threshold to check at (default: 0.7)')
+    args = parser.parse_args()
+
+    failures = 0
+    for first, second in POLARITY_PAIRS:
+        # Fresh index per pair, in both orders, so each pair is checked on its own
+        for pair in ((first, second), (second, first)):
+            ids = ThemeIndex(threshold=args.threshold).assign(pair)
+            if ids[0] == ids[1]:
+                failures += 1
+                print(f"Merged: {pair[0]!r} <- {pair[1]!r}")
+    print(f"{len(POLARITY_PAIRS)} pairs checked, {failures} merged")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
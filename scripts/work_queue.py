@@ -0,0 +1,312 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+import argparse
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    position INTEGER PRIMARY KEY,
+    review_id TEXT,
+    priority INTEGER,
+    payload TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    last_error TEXT,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    started_at REAL,
+    last_seen REAL,
+    claimed INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    lost_leases INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS queue_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_state_priority ON tasks(state, priority);
+CREATE INDEX IF NOT EXISTS idx_tasks_state_lease ON tasks(state, lease_expires);
+"""
+
+DEFAULT_LEASE_SECONDS = 300.0
+DEFAULT_MAX_ATTEMPTS = 3
+TASK_STATES = ["pending", "leased", "done", "failed"]
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    """Durable SQLite queue of review analysis tasks shared by any number of workers
+
+    Workers claim tasks under a time-limited lease and write the result back.
+    A lease that runs out (crashed or stalled worker) makes the task claimable
+    again, and a result carrying an analysis error is retried until
+    max_attempts, so throttled workers simply fall behind while the others
+    keep draining the queue. Progress lives in the database and can be read
+    with get_stats() (or "work_queue.py status") while workers are running.
+    """
+
+    def __init__(self, db_path: str, lease_seconds: Optional[float] = None, max_attempts: Optional[int] = None):
+        self.db_path = db_path
+        # Autocommit mode; multi-statement changes use explicit BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+
+        if lease_seconds is not None:
+            self._set_meta('lease_seconds', lease_seconds)
+        if max_attempts is not None:
+            self._set_meta('max_attempts', max_attempts)
+        self.lease_seconds = float(self._get_meta('lease_seconds', DEFAULT_LEASE_SECONDS))
+        self.max_attempts = int(self._get_meta('max_attempts', DEFAULT_MAX_ATTEMPTS))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _get_meta(self, key: str, default: Any = None) -> Any:
+        row = self.conn.execute("SELECT value FROM queue_meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row['value']) if row else default
+
+    def _set_meta(self, key: str, value: Any):
+        self.conn.execute("INSERT INTO queue_meta (key, value) VALUES (?, ?) "
+                          "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, json.dumps(value)))
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def enqueue(self, reviews: List[Dict[str, Any]], order: Optional[List[int]] = None,
+                review_ids: Optional[List[Any]] = None) -> int:
+        """Add one task per review, claimed in the given order; returns the number added
+
+        Tasks are keyed by input position, so enqueueing the same reviews again
+        (a restarted coordinator) resumes the existing queue instead of
+        duplicating it. A queue holding any other reviews raises ValueError.
+        """
+        order = order if order is not None else list(range(len(reviews)))
+        existing = len(self)
+        if existing and existing != len(reviews):
+            raise ValueError(f"Queue {self.db_path} already holds {existing} tasks, "
+                             f"not the {len(reviews)} reviews given")
+        if existing:
+            for row in self.conn.execute("SELECT position, payload FROM tasks ORDER BY position"):
+                if json.loads(row['payload']) != reviews[row['position']]:
+                    raise ValueError(f"Queue {self.db_path} holds different reviews than the input "
+                                     f"(first difference at review {row['position'] + 1}); "
+                                     "use a new queue file for this input")
+            return 0
+
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tasks (position, review_id, priority, payload, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ((i, None if review_ids is None else review_ids[i], priority,
+                  json.dumps(reviews[i], ensure_ascii=False), now)
+                 for priority, i in enumerate(order))
+            )
+            self._set_meta('created_at', now)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return len(reviews)
+
+    def claim(self, worker_id: str, limit: int = 1) -> List[Dict[str, Any]]:
+        """Lease up to limit tasks to a worker, highest priority first
+
+        Expired leases are reclaimed here; tasks whose lease expired on the last
+        allowed attempt are marked failed instead. Returns dicts with position,
+        review and attempt.
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "UPDATE tasks SET state = 'failed', worker = NULL, lease_expires = NULL, updated_at = ?, "
+                "last_error = 'lease expired on attempt ' || attempts "
+                "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+            # Two index range scans (state, priority) and (state, lease_expires),
+            # so a claim never sorts the whole queue while holding the write lock
+            candidates = self.conn.execute(
+                "SELECT position, priority, attempts FROM tasks WHERE state = 'pending' ORDER BY priority LIMIT ?",
+                (limit,)
+            ).fetchall()
+            candidates += self.conn.execute(
+                "SELECT position, priority, attempts FROM tasks WHERE state = 'leased' AND lease_expires < ? "
+                "ORDER BY lease_expires LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            claimed = sorted(candidates, key=lambda row: row['priority'])[:limit]
+            self.conn.executemany(
+                "UPDATE tasks SET state = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE position = ?",
+                [(worker_id, now + self.lease_seconds, now, row['position']) for row in claimed]
+            )
+            self._touch_worker(worker_id, now, claimed=len(claimed))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        # Payloads only for the claimed rows, after the write lock is released
+        tasks = []
+        for row in claimed:
+            payload = self.conn.execute("SELECT payload FROM tasks WHERE position = ?", (row['position'],)).fetchone()[0]
+            tasks.append({"position": row['position'], "review": json.loads(payload), "attempt": row['attempts'] + 1})
+        return tasks
+
+    def complete(self, position: int, worker_id: str, result: Dict[str, Any]) -> bool:
+        """Store a worker's result for a leased task
+
+        A result with an 'error' (the analyzer's fallback) goes back to pending
+        until the task has used max_attempts, then is kept as the final result.
+        Returns False, storing nothing, if the worker no longer holds the lease.
+        """
+        now = time.time()
+        is_error = 'error' in result
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("SELECT attempts FROM tasks WHERE position = ? AND state = 'leased' AND worker = ?",
+                                    (position, worker_id)).fetchone()
+            if row is None:
+                self._touch_worker(worker_id, now, lost_leases=1)
+                self.conn.execute("COMMIT")
+                return False
+
+            if not is_error:
+                state = 'done'
+            elif row['attempts'] >= self.max_attempts:
+                state = 'failed'
+            else:
+                state = 'pending'
+            self.conn.execute(
+                "UPDATE tasks SET state = ?, worker = NULL, lease_expires = NULL, review_id = ?, result = ?, "
+                "last_error = ?, updated_at = ? WHERE position = ?",
+                (state, result.get('review_id'), json.dumps(result, ensure_ascii=False),
+                 result.get('error') if is_error else None, now, position)
+            )
+            self._touch_worker(worker_id, now, completed=int(not is_error), failed=int(is_error))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def _touch_worker(self, worker_id: str, now: float, claimed: int = 0, completed: int = 0,
+                      failed: int = 0, lost_leases: int = 0):
+        self.conn.execute(
+            "INSERT INTO workers (worker_id, started_at, last_seen, claimed, completed, failed, lost_leases) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(worker_id) DO UPDATE SET last_seen = excluded.last_seen, "
+            "claimed = claimed + excluded.claimed, completed = completed + excluded.completed, "
+            "failed = failed + excluded.failed, lost_leases = lost_leases + excluded.lost_leases",
+            (worker_id, now, now, claimed, completed, failed, lost_leases)
+        )
+
+    def is_drained(self) -> bool:
+        """True when no task is pending or leased"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM tasks WHERE state IN ('pending', 'leased')").fetchone()[0] == 0
+
+    def iter_results(self) -> Iterator[Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[str]]]:
+        """(review, result or None, last error) for every task, in input order"""
+        for row in self.conn.execute("SELECT payload, result, last_error FROM tasks ORDER BY position"):
+            yield (json.loads(row['payload']), json.loads(row['result']) if row['result'] else None,
+                   row['last_error'])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, retries and per-worker throughput, safe to call mid-run"""
+        now = time.time()
+        counts = {state: 0 for state in TASK_STATES}
+        for row in self.conn.execute("SELECT state, COUNT(*) AS n FROM tasks GROUP BY state"):
+            counts[row['state']] = row['n']
+        retry_row = self.conn.execute(
+            "SELECT COALESCE(SUM(attempts - 1), 0) AS retries, COUNT(*) AS retried FROM tasks WHERE attempts > 1"
+        ).fetchone()
+        expired = self.conn.execute("SELECT COUNT(*) FROM tasks WHERE state = 'leased' AND lease_expires < ?",
+                                    (now,)).fetchone()[0]
+
+        workers = []
+        for row in self.conn.execute("SELECT * FROM workers ORDER BY started_at"):
+            elapsed = max(row['last_seen'] - row['started_at'], 1e-9)
+            finished = row['completed'] + row['failed']
+            workers.append({
+                "worker_id": row['worker_id'],
+                "claimed": row['claimed'],
+                "completed": row['completed'],
+                "failed_attempts": row['failed'],
+                "lost_leases": row['lost_leases'],
+                "reviews_per_minute": round(finished / elapsed * 60, 2) if finished > 1 else None,
+                "idle_seconds": round(now - row['last_seen'], 1)
+            })
+
+        return {
+            "tasks": sum(counts.values()),
+            "depth": counts['pending'] + counts['leased'],
+            "states": counts,
+            "expired_leases": expired,
+            "retries": retry_row['retries'],
+            "retried_tasks": retry_row['retried'],
+            "lease_seconds": self.lease_seconds,
+            "max_attempts": self.max_attempts,
+            "workers": workers
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect a review analysis work queue')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    status_parser = subparsers.add_parser('status', help='Show queue depth, retries and worker throughput')
+    status_parser.add_argument('db', help='Path to the queue database')
+    status_parser.add_argument('--json', action='store_true', help='Print the stats as JSON')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Error: queue database not found: {args.db}")
+        return
+
+    with WorkQueue(args.db) as queue:
+        stats = queue.get_stats()
+    if args.json:
+        print(json.dumps(stats, indent=2))
+        return
+
+    states = stats['states']
+    print(f"Tasks: {stats['tasks']}  depth: {stats['depth']}  "
+          + "  ".join(f"{state}: {states[state]}" for state in TASK_STATES))
+    print(f"Expired leases: {stats['expired_leases']}  retries: {stats['retries']} "
+          f"over {stats['retried_tasks']} tasks  (lease {stats['lease_seconds']:g}s, "
+          f"max {stats['max_attempts']} attempts)")
+    for worker in stats['workers']:
+        rate = worker['reviews_per_minute']
+        print(f"  {worker['worker_id']:<30} done={worker['completed']:<6} errors={worker['failed_attempts']:<4} "
+              f"lost={worker['lost_leases']:<3} rate={'-' if rate is None else f'{rate:g}/min':<12} "
+              f"idle={worker['idle_seconds']:g}s")
+
+
+if __name__ == "__main__":
+    main()